@@ -15,6 +15,7 @@
 结果范围: 0-100
 """
 
+import heapq
 import math
 import logging
 from typing import Dict, Any, Optional, List, Tuple
@@ -215,6 +216,18 @@ DEFAULT_KEYWORD_PROFILES = {
 }
 
 
+# 平台名称 -> 枚举的分发表 (模块级构建一次，避免每次调用重建)
+PLATFORM_MAP: Dict[str, Platform] = {
+    "tiktok": Platform.TIKTOK,
+    "instagram": Platform.INSTAGRAM,
+    "reddit": Platform.REDDIT,
+    "youtube": Platform.YOUTUBE,
+    "twitter": Platform.TWITTER,
+    "x": Platform.TWITTER,
+    "linkedin": Platform.LINKEDIN,
+}
+
+
 def clamp(x: float, lo: float = 0.0, hi: float = 1.0) -> float:
     """将值限制在指定范围内"""
     return max(lo, min(hi, x))
@@ -227,11 +240,18 @@ def safe_growth(curr: float, prev: float) -> float:
     return (curr - prev) / prev
 
 
+# log1p(max_value) 分母缓存 — max_value 只有固定几档，避免每次调用重算超越函数
+_LOG1P_DENOM_CACHE: Dict[float, float] = {}
+
+
 def log_normalize(value: float, max_value: float = 100000000) -> float:
     """对数归一化，用于处理大数值"""
     if value <= 0:
         return 0.0
-    return math.log1p(value) / math.log1p(max_value)
+    denom = _LOG1P_DENOM_CACHE.get(max_value)
+    if denom is None:
+        denom = _LOG1P_DENOM_CACHE[max_value] = math.log1p(max_value)
+    return math.log1p(value) / denom
 
 
 class AdaptiveTrendScorer:
@@ -248,18 +268,7 @@ class AdaptiveTrendScorer:
     def detect_platform(self, platform_str: str) -> Platform:
         """检测平台类型"""
         platform_lower = platform_str.lower().strip()
-        
-        platform_map = {
-            "tiktok": Platform.TIKTOK,
-            "instagram": Platform.INSTAGRAM,
-            "reddit": Platform.REDDIT,
-            "youtube": Platform.YOUTUBE,
-            "twitter": Platform.TWITTER,
-            "x": Platform.TWITTER,
-            "linkedin": Platform.LINKEDIN,
-        }
-        
-        return platform_map.get(platform_lower, Platform.UNKNOWN)
+        return PLATFORM_MAP.get(platform_lower, Platform.UNKNOWN)
     
     def get_platform_config(self, platform: Platform) -> PlatformMetricMapping:
         """获取平台配置"""
@@ -942,9 +951,10 @@ class AdaptiveTrendScorer:
                 )
                 
                 platform_results.append(score_result)
-            
-            # 按分数排序
-            platform_results.sort(key=lambda x: x.get("trend_score", 0), reverse=True)
+
+            # 按分数排序 (少于2条时排序是空操作，直接跳过)
+            if len(platform_results) > 1:
+                platform_results.sort(key=lambda x: x.get("trend_score", 0), reverse=True)
             results[platform_key] = platform_results
         
         return results
@@ -967,17 +977,16 @@ class AdaptiveTrendScorer:
             跨平台的 Top N 趋势列表
         """
         all_results = self.process_crawl_data(crawl_data)
-        
-        # 合并所有平台结果
-        all_trends = []
-        for platform, results in all_results.items():
-            all_trends.extend(results)
-        
-        # 过滤和排序
-        filtered = [t for t in all_trends if t.get("trend_score", 0) >= min_score]
-        filtered.sort(key=lambda x: x.get("trend_score", 0), reverse=True)
-        
-        return filtered[:top_n]
+
+        # 过滤 + Top-N 一步完成: 生成器直接喂给 nlargest，
+        # 只保留 top_n 大小的堆，不物化全量中间列表
+        candidates = (
+            t
+            for results in all_results.values()
+            for t in results
+            if t.get("trend_score", 0) >= min_score
+        )
+        return heapq.nlargest(top_n, candidates, key=lambda x: x.get("trend_score", 0))
 
 
 # 全局单例
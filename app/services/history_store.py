@@ -8,17 +8,57 @@ History Store Service - 历史数据存储服务 (SQLite 版本)
 - 自动清理过期数据
 """
 
+import atexit
 import logging
 import sqlite3
 import json
 import os
 import threading
+import time
+import zlib
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Tuple
+from contextlib import contextmanager, nullcontext
+from uuid import uuid4
 
 logger = logging.getLogger(__name__)
 
+# JSON 序列化：优先使用 orjson（C 实现，序列化/解析比 stdlib 快数倍），
+# 环境缺少 orjson 时回退到 stdlib json
+try:
+    import orjson
+
+    def _json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    def _json_dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover
+    _json_dumps = json.dumps
+
+    def _json_dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    _json_loads = json.loads
+
+
+def _compress_raw(raw_data: Dict[str, Any]) -> bytes:
+    """raw_data → zlib 压缩的 BLOB
+
+    爬虫原始数据高度可压缩，压缩后每行字节数大幅下降，
+    减少页缓存压力和 WAL 写入量。等级 1 以吞吐优先。
+    """
+    return zlib.compress(_json_dumps_bytes(raw_data), 1)
+
+
+def _decompress_raw(value: Any) -> Dict[str, Any]:
+    """读取 raw_data 列，兼容旧版未压缩的 TEXT 行"""
+    if isinstance(value, bytes):
+        return _json_loads(zlib.decompress(value))
+    return _json_loads(value)
+
 # 数据保留时间（小时）
 RETENTION_HOURS = 2
 
@@ -43,27 +83,160 @@ class HistoryStore:
         self._db_path = db_path
         self._retention_hours = retention_hours
         self._lock = threading.Lock()
-        self._record_count = 0
         self._last_vacuum_time = datetime.utcnow()
         self._vacuum_interval_hours = 24  # 每24小时自动 VACUUM 一次
-        
+
+        # 每线程缓存一个长连接，避免每次调用重新 open/close + 冷页缓存
+        self._tls = threading.local()
+        self._open_conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+
         # 确保数据目录存在
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        
+
+        # 内存 staging 库：新插入先落在共享内存表，后台定时整批落盘，
+        # 把高频小事务的 fsync 开销换成大事务顺序追加
+        self._hot_uri = f"file:history_hot_{id(self)}?mode=memory&cache=shared"
+        self._hot_lock = threading.Lock()
+        self._hot_pending = 0
+        # 保活连接：共享内存库在最后一个连接关闭时销毁
+        self._hot_keeper = sqlite3.connect(self._hot_uri, uri=True, check_same_thread=False)
+
         # 初始化数据库
         self._init_db()
-        
+
+        # 仪表盘轮询缓存：短 TTL 把 N 个轮询方折叠为每周期一次查询
+        self._query_cache: Dict[Any, Tuple[float, Any]] = {}
+        self._query_cache_ttl = 3.0
+
+        # 后台维护：定时清理 + staging 表落盘。
+        # 必须用单个常驻线程而不是 threading.Timer——Timer 每次触发都换
+        # 一个新线程，_get_connection 的每线程长连接就会一个 tick 泄漏一个
+        self._cleanup_interval_seconds = 60.0
+        self._hot_flush_interval_seconds = 2.0
+        self._closed = False
+        self._maintenance_stop = threading.Event()
+        self._maintenance_thread = threading.Thread(
+            target=self._maintenance_loop,
+            daemon=True,
+            name="history-store-maintenance"
+        )
+        self._maintenance_thread.start()
+
+        atexit.register(self.close)
         logger.info(f"HistoryStore initialized with SQLite: {db_path}")
     
+    def _configure_connection(self, conn: sqlite3.Connection):
+        """应用性能相关的 PRAGMA 配置
+
+        journal_mode=WAL 持久化在数据库文件中，其余 PRAGMA 是连接级别的，
+        每个新连接都需要重新设置。
+        """
+        conn.execute("PRAGMA journal_mode=WAL")       # 写入只追加 WAL，避免每次 fsync 回滚日志
+        conn.execute("PRAGMA synchronous=NORMAL")     # WAL 模式下安全且大幅减少 fsync
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")      # 64MB 页缓存
+        conn.execute("PRAGMA mmap_size=268435456")    # 256MB mmap
+        conn.execute("PRAGMA wal_autocheckpoint=1000")
+
     @contextmanager
     def _get_connection(self):
-        """获取数据库连接的上下文管理器"""
-        conn = sqlite3.connect(self._db_path, timeout=30.0)
-        conn.row_factory = sqlite3.Row
+        """获取数据库连接的上下文管理器（每线程复用长连接）"""
+        conn = getattr(self._tls, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self._db_path,
+                timeout=30.0,
+                check_same_thread=False,
+                isolation_level=None,  # 自动提交，读操作不开隐式事务
+                uri=True  # 允许 ATTACH 使用共享内存库的 URI
+            )
+            conn.row_factory = sqlite3.Row
+            self._configure_connection(conn)
+            conn.execute(f"ATTACH DATABASE '{self._hot_uri}' AS hot")
+            self._tls.conn = conn
+            with self._conns_lock:
+                self._open_conns.append(conn)
+        yield conn
+
+    def _cache_get(self, key: Any) -> Optional[Any]:
+        """读取未过期的缓存结果，不存在或已过期返回 None"""
+        entry = self._query_cache.get(key)
+        if entry is not None and time.monotonic() < entry[0]:
+            return entry[1]
+        return None
+
+    def _cache_put(self, key: Any, value: Any) -> Any:
+        self._query_cache[key] = (time.monotonic() + self._query_cache_ttl, value)
+        return value
+
+    def _invalidate_query_cache(self):
+        self._query_cache.clear()
+
+    def _maintenance_loop(self):
+        """常驻维护线程：每 2s 落盘 staging 表，每 60s 过期清理
+
+        两个周期共用一个线程（线程本地连接只建一次），短周期 wait 驱动
+        落盘，清理按 monotonic 截止时间叠在同一个循环上。
+        """
+        next_cleanup = time.monotonic() + self._cleanup_interval_seconds
+        while not self._maintenance_stop.wait(self._hot_flush_interval_seconds):
+            try:
+                self._flush_hot()
+            except Exception as e:
+                logger.warning(f"Hot table flush failed: {e}")
+            if time.monotonic() >= next_cleanup:
+                next_cleanup = time.monotonic() + self._cleanup_interval_seconds
+                try:
+                    self._cleanup_expired()
+                    self._check_periodic_vacuum()
+                except Exception as e:
+                    logger.warning(f"Background cleanup failed: {e}")
+
+    def _flush_hot(self):
+        """把内存 staging 表整批落盘（单事务顺序追加）"""
+        if self._hot_pending == 0:
+            return
+        with self._hot_lock:
+            if self._hot_pending == 0:
+                return
+            self._hot_pending = 0
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    cursor.execute(
+                        "INSERT OR REPLACE INTO main.score_records "
+                        "SELECT * FROM hot.score_records"
+                    )
+                    cursor.execute("DELETE FROM hot.score_records")
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+
+    def close(self):
+        """关闭所有缓存的数据库连接（进程退出时调用）"""
+        self._closed = True
+        self._maintenance_stop.set()
+        if self._maintenance_thread.is_alive():
+            self._maintenance_thread.join(timeout=5.0)
         try:
-            yield conn
-        finally:
-            conn.close()
+            self._flush_hot()
+        except Exception as e:
+            logger.warning(f"Final hot flush failed: {e}")
+        with self._conns_lock:
+            for conn in self._open_conns:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._open_conns.clear()
+        try:
+            self._hot_keeper.close()
+        except Exception:
+            pass
+        self._tls = threading.local()
     
     def _init_db(self):
         """初始化数据库表"""
@@ -71,6 +244,8 @@ class HistoryStore:
             cursor = conn.cursor()
             
             # 创建主表
+            # 6 个维度分数用独立 REAL 列存储（而非 JSON TEXT），
+            # 省去每行的 JSON 编解码并可直接做数值聚合
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS score_records (
                     id TEXT PRIMARY KEY,
@@ -78,9 +253,15 @@ class HistoryStore:
                     platform TEXT NOT NULL,
                     hashtag TEXT NOT NULL,
                     trend_score REAL NOT NULL,
-                    dimensions TEXT NOT NULL,
-                    raw_data TEXT NOT NULL,
+                    dim_h REAL DEFAULT 0,
+                    dim_v REAL DEFAULT 0,
+                    dim_d REAL DEFAULT 0,
+                    dim_f REAL DEFAULT 0,
+                    dim_m REAL DEFAULT 0,
+                    dim_r REAL DEFAULT 0,
+                    raw_data BLOB NOT NULL,
                     author TEXT DEFAULT '',
+                    title TEXT DEFAULT '',
                     description TEXT DEFAULT '',
                     post_id TEXT DEFAULT '',
                     content_url TEXT DEFAULT '',
@@ -90,36 +271,126 @@ class HistoryStore:
                     created_at TEXT DEFAULT CURRENT_TIMESTAMP
                 )
             """)
-            
-            # 创建索引
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_platform 
-                ON score_records(platform)
-            """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_timestamp 
-                ON score_records(timestamp)
-            """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_trend_score 
-                ON score_records(trend_score DESC)
-            """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_hashtag 
-                ON score_records(hashtag)
+
+            # 旧库迁移：dimensions JSON 列 → 6 个 REAL 列
+            self._migrate_legacy_dimensions(cursor)
+
+            # 旧库补列：历史版本缺 title/content_url/cover_url，
+            # 启动时一次性补齐，读路径即可走直线取列（无 try/except 兜底）
+            cursor.execute("PRAGMA table_info(score_records)")
+            existing_cols = {row[1] for row in cursor.fetchall()}
+            for col in ("title", "content_url", "cover_url"):
+                if col not in existing_cols:
+                    cursor.execute(f"ALTER TABLE score_records ADD COLUMN {col} TEXT DEFAULT ''")
+
+            # staging 表 + 索引 DDL 一次 executescript 执行：
+            # 单事务、单次 parse/VDBE 往返，而不是逐条 execute
+            # 复合索引服务热点查询：按平台排名 / 按平台取时间序列，
+            # 单列 idx_platform 是 idx_platform_score 的前缀，不再需要
+            cursor.executescript("""
+                BEGIN;
+                CREATE TABLE IF NOT EXISTS hot.score_records AS
+                    SELECT * FROM main.score_records WHERE 0;
+                DROP INDEX IF EXISTS idx_platform;
+                CREATE INDEX IF NOT EXISTS idx_platform_score
+                    ON score_records(platform, trend_score DESC);
+                CREATE INDEX IF NOT EXISTS idx_platform_ts
+                    ON score_records(platform, timestamp);
+                CREATE INDEX IF NOT EXISTS idx_timestamp
+                    ON score_records(timestamp);
+                CREATE INDEX IF NOT EXISTS idx_trend_score
+                    ON score_records(trend_score DESC);
+                CREATE INDEX IF NOT EXISTS idx_hashtag
+                    ON score_records(hashtag);
+                -- platform+post_id 去重的数据库级兜底：应用层「先查后插」
+                -- 在并发下不是原子的。建索引前先清掉历史重复行（留最新）
+                DELETE FROM main.score_records
+                    WHERE post_id NOT IN ('', 'unknown')
+                      AND rowid NOT IN (
+                        SELECT MAX(rowid) FROM main.score_records
+                        WHERE post_id NOT IN ('', 'unknown')
+                        GROUP BY platform, post_id);
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_unique_post
+                    ON score_records(platform, post_id)
+                    WHERE post_id NOT IN ('', 'unknown');
+                CREATE UNIQUE INDEX IF NOT EXISTS hot.idx_hot_unique_post
+                    ON score_records(platform, post_id)
+                    WHERE post_id NOT IN ('', 'unknown');
+                COMMIT;
             """)
-            
-            conn.commit()
-            
-            # 获取当前记录数
+
             cursor.execute("SELECT COUNT(*) FROM score_records")
-            self._record_count = cursor.fetchone()[0]
-            
-            logger.info(f"Database initialized, existing records: {self._record_count}")
+            existing = cursor.fetchone()[0]
+            logger.info(f"Database initialized, existing records: {existing}")
     
+    def _migrate_legacy_dimensions(self, cursor: sqlite3.Cursor):
+        """把旧版 dimensions JSON 列迁移为 dim_h..dim_r 独立列"""
+        cursor.execute("PRAGMA table_info(score_records)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if "dimensions" not in columns:
+            return
+
+        logger.info("Migrating score_records: dimensions JSON -> dedicated REAL columns")
+        title_expr = "title" if "title" in columns else "''"
+        content_url_expr = "content_url" if "content_url" in columns else "''"
+        cover_url_expr = "cover_url" if "cover_url" in columns else "''"
+        cursor.execute("ALTER TABLE score_records RENAME TO score_records_legacy")
+        cursor.execute("""
+            CREATE TABLE score_records (
+                id TEXT PRIMARY KEY,
+                timestamp TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                hashtag TEXT NOT NULL,
+                trend_score REAL NOT NULL,
+                dim_h REAL DEFAULT 0,
+                dim_v REAL DEFAULT 0,
+                dim_d REAL DEFAULT 0,
+                dim_f REAL DEFAULT 0,
+                dim_m REAL DEFAULT 0,
+                dim_r REAL DEFAULT 0,
+                raw_data BLOB NOT NULL,
+                author TEXT DEFAULT '',
+                title TEXT DEFAULT '',
+                description TEXT DEFAULT '',
+                post_id TEXT DEFAULT '',
+                content_url TEXT DEFAULT '',
+                cover_url TEXT DEFAULT '',
+                lifecycle TEXT DEFAULT 'unknown',
+                priority TEXT DEFAULT 'P3',
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute(f"""
+            INSERT INTO score_records
+            SELECT id, timestamp, platform, hashtag, trend_score,
+                   COALESCE(json_extract(dimensions, '$.H'), 0),
+                   COALESCE(json_extract(dimensions, '$.V'), 0),
+                   COALESCE(json_extract(dimensions, '$.D'), 0),
+                   COALESCE(json_extract(dimensions, '$.F'), 0),
+                   COALESCE(json_extract(dimensions, '$.M'), 0),
+                   COALESCE(json_extract(dimensions, '$.R'), 0),
+                   raw_data, author, {title_expr}, description, post_id,
+                   {content_url_expr}, {cover_url_expr}, lifecycle, priority, created_at
+            FROM score_records_legacy
+        """)
+        cursor.execute("DROP TABLE score_records_legacy")
+
+    @staticmethod
+    def _dims_to_columns(dimensions: Dict[str, float]) -> Tuple[float, float, float, float, float, float]:
+        """将 dimensions 字典展开为 dim_h..dim_r 列值"""
+        return (
+            dimensions.get("H", 0),
+            dimensions.get("V", 0),
+            dimensions.get("D", 0),
+            dimensions.get("F", 0),
+            dimensions.get("M", 0),
+            dimensions.get("R", 0),
+        )
+
     @property
     def total_records(self) -> int:
         """总记录数"""
+        self._flush_hot()
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT COUNT(*) FROM score_records")
@@ -162,80 +433,117 @@ class HistoryStore:
         Returns:
             dict: 创建或更新的记录
         """
-        with self._lock:
-            now = datetime.utcnow()
-            platform_upper = platform.upper()
-            
-            # 如果有 post_id，检查是否已存在
-            existing_id = None
-            if post_id and post_id != "unknown":
-                with self._get_connection() as conn:
-                    cursor = conn.cursor()
+        # 不再持有进程级写锁：WAL 模式下由 SQLite 自己串行化写事务，
+        # JSON 编码等纯 Python 工作不会阻塞其他写入线程
+        now = datetime.utcnow()
+        platform_upper = platform.upper()
+
+        # 如果有 post_id，检查是否已存在（staging 表优先，其次主表）
+        existing_id = None
+        target_table = "score_records"
+        if post_id and post_id != "unknown":
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                with self._hot_lock:
+                    cursor.execute(
+                        "SELECT id FROM hot.score_records WHERE platform = ? AND post_id = ?",
+                        (platform_upper, post_id)
+                    )
+                    row = cursor.fetchone()
+                if row:
+                    target_table = "hot.score_records"
+                else:
                     cursor.execute(
                         "SELECT id FROM score_records WHERE platform = ? AND post_id = ?",
                         (platform_upper, post_id)
                     )
                     row = cursor.fetchone()
-                    if row:
-                        existing_id = row[0]
-            
-            if existing_id:
-                # 更新已有记录
-                record_id = existing_id
-                with self._get_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        UPDATE score_records SET
-                            timestamp = ?,
-                            hashtag = ?,
-                            trend_score = ?,
-                            dimensions = ?,
-                            raw_data = ?,
-                            author = ?,
-                            title = ?,
-                            description = ?,
-                            content_url = ?,
-                            cover_url = ?,
-                            lifecycle = ?,
-                            priority = ?
-                        WHERE id = ?
-                    """, (
-                        now.isoformat(),
-                        hashtag,
-                        trend_score,
-                        json.dumps(dimensions),
-                        json.dumps(raw_data),
-                        author,
-                        title[:200] if title else "",
-                        description[:500] if description else "",
-                        content_url,
-                        cover_url,
-                        lifecycle,
-                        priority,
-                        existing_id
-                    ))
-                    conn.commit()
-                logger.debug(f"Updated record: {record_id}, platform={platform}, score={trend_score}")
-            else:
-                # 插入新记录
-                self._record_count += 1
-                record_id = f"{platform_upper}-{self._record_count}-{now.strftime('%H%M%S%f')}"
-                
-                with self._get_connection() as conn:
-                    cursor = conn.cursor()
+                if row:
+                    existing_id = row[0]
+
+        if existing_id:
+            # 更新已有记录（staging 行加 _hot_lock，避免与落盘事务冲突）
+            record_id = existing_id
+            update_set = """ SET
+                        timestamp = ?,
+                        hashtag = ?,
+                        trend_score = ?,
+                        dim_h = ?, dim_v = ?, dim_d = ?, dim_f = ?, dim_m = ?, dim_r = ?,
+                        raw_data = ?,
+                        author = ?,
+                        title = ?,
+                        description = ?,
+                        content_url = ?,
+                        cover_url = ?,
+                        lifecycle = ?,
+                        priority = ?
+                    WHERE id = ?"""
+            update_params = (
+                now.isoformat(),
+                hashtag,
+                trend_score,
+                *self._dims_to_columns(dimensions),
+                _compress_raw(raw_data),
+                author,
+                title[:200] if title else "",
+                description[:500] if description else "",
+                content_url,
+                cover_url,
+                lifecycle,
+                priority,
+                existing_id
+            )
+            lock = self._hot_lock if target_table.startswith("hot.") else nullcontext()
+            with self._get_connection() as conn, lock:
+                cursor = conn.cursor()
+                cursor.execute(f"UPDATE {target_table}{update_set}", update_params)
+                if target_table.startswith("hot.") and cursor.rowcount == 0:
+                    # 探测到 UPDATE 之间 staging 行可能刚好被落盘迁走；
+                    # id 跨迁移不变，改到主表重试，避免静默丢更新
+                    cursor.execute(f"UPDATE score_records{update_set}", update_params)
+                conn.commit()
+            logger.debug(f"Updated record: {record_id}, platform={platform}, score={trend_score}")
+        else:
+            # 插入新记录（uuid 生成 ID，无需受保护的共享计数器）
+            # 新行先进内存 staging 表，由后台 flush 整批落盘
+            record_id = f"{platform_upper}-{uuid4().hex}"
+
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                with self._hot_lock:
+                    # ON CONFLICT 兜底并发的同帖插入：两个线程的探测都扑空时
+                    # 后到的一方退化为更新，不会留下重复行
                     cursor.execute("""
-                        INSERT INTO score_records 
-                        (id, timestamp, platform, hashtag, trend_score, dimensions, 
-                         raw_data, author, title, description, post_id, content_url, cover_url, lifecycle, priority)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        INSERT INTO hot.score_records
+                        (id, timestamp, platform, hashtag, trend_score,
+                         dim_h, dim_v, dim_d, dim_f, dim_m, dim_r,
+                         raw_data, author, title, description, post_id, content_url, cover_url, lifecycle, priority,
+                         created_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(platform, post_id) WHERE post_id NOT IN ('', 'unknown')
+                        DO UPDATE SET
+                            timestamp = excluded.timestamp,
+                            hashtag = excluded.hashtag,
+                            trend_score = excluded.trend_score,
+                            dim_h = excluded.dim_h, dim_v = excluded.dim_v,
+                            dim_d = excluded.dim_d, dim_f = excluded.dim_f,
+                            dim_m = excluded.dim_m, dim_r = excluded.dim_r,
+                            raw_data = excluded.raw_data,
+                            author = excluded.author,
+                            title = excluded.title,
+                            description = excluded.description,
+                            content_url = excluded.content_url,
+                            cover_url = excluded.cover_url,
+                            lifecycle = excluded.lifecycle,
+                            priority = excluded.priority
                     """, (
                         record_id,
                         now.isoformat(),
                         platform_upper,
                         hashtag,
                         trend_score,
-                        json.dumps(dimensions),
-                        json.dumps(raw_data),
+                        *self._dims_to_columns(dimensions),
+                        _compress_raw(raw_data),
                         author,
                         title[:200] if title else "",
                         description[:500] if description else "",
@@ -243,42 +551,170 @@ class HistoryStore:
                         content_url,
                         cover_url,
                         lifecycle,
-                        priority
+                        priority,
+                        now.strftime('%Y-%m-%d %H:%M:%S')
                     ))
                     conn.commit()
-                logger.debug(f"Added record: {record_id}, platform={platform}, score={trend_score}")
-            
-            record = {
-                "id": record_id,
-                "timestamp": now.isoformat(),
-                "platform": platform_upper,
-                "hashtag": hashtag,
-                "trend_score": trend_score,
-                "dimensions": dimensions,
-                "raw_data": raw_data,
-                "author": author,
-                "title": title[:200] if title else "",
-                "description": description[:500] if description else "",
-                "post_id": post_id,
-                "content_url": content_url,
-                "cover_url": cover_url,
-                "lifecycle": lifecycle,
-                "priority": priority
-            }
-            
-            # 定期清理（每100条记录清理一次）
-            if self._record_count % 100 == 0:
-                self._cleanup_expired()
-                # 检查是否需要定期 VACUUM
-                self._check_periodic_vacuum()
-                
-            return record
-    
+                    self._hot_pending += 1
+            logger.debug(f"Added record: {record_id}, platform={platform}, score={trend_score}")
+        
+        record = {
+            "id": record_id,
+            "timestamp": now.isoformat(),
+            "platform": platform_upper,
+            "hashtag": hashtag,
+            "trend_score": trend_score,
+            "dimensions": dimensions,
+            "raw_data": raw_data,
+            "author": author,
+            "title": title[:200] if title else "",
+            "description": description[:500] if description else "",
+            "post_id": post_id,
+            "content_url": content_url,
+            "cover_url": cover_url,
+            "lifecycle": lifecycle,
+            "priority": priority
+        }
+
+        # 过期清理由后台定时器按 monotonic 间隔触发，写路径不再承担
+        return record
+
+    def add_records_bulk(self, records: List[dict]) -> Tuple[int, int]:
+        """
+        批量添加或更新得分记录（单事务 + executemany）
+
+        与 add_record 语义一致（基于 platform + post_id 去重），但把 N 条
+        记录的 fsync 和 SQL 解析开销摊到一次事务上，适合爬虫批量入库。
+
+        Args:
+            records: 记录列表，每个元素为 add_record 的参数字典
+                     (platform, hashtag, trend_score, dimensions, raw_data, ...)
+
+        Returns:
+            (inserted, updated): 新增数量和更新数量
+        """
+        if not records:
+            return 0, 0
+
+        now = datetime.utcnow()
+        now_str = now.isoformat()
+
+        self._flush_hot()  # 去重查询需要看到 staging 行
+        with self._lock:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+
+                # 一次查询找出已存在的 (platform, post_id) 记录
+                dedupe_keys = [
+                    (r["platform"].upper(), r.get("post_id", ""))
+                    for r in records
+                    if r.get("post_id") and r.get("post_id") != "unknown"
+                ]
+                existing_ids: Dict[Tuple[str, str], str] = {}
+                # 每对键占 2 个绑定变量，按 499 对分段，
+                # 不超过保守编译 SQLite 的 999 变量上限
+                for start in range(0, len(dedupe_keys), 499):
+                    chunk = dedupe_keys[start:start + 499]
+                    placeholders = ",".join(["(?, ?)"] * len(chunk))
+                    flat = [v for pair in chunk for v in pair]
+                    cursor.execute(
+                        f"SELECT id, platform, post_id FROM score_records "
+                        f"WHERE (platform, post_id) IN (VALUES {placeholders})",
+                        flat
+                    )
+                    for row in cursor.fetchall():
+                        existing_ids[(row["platform"], row["post_id"])] = row["id"]
+
+                update_rows = []
+                insert_rows = []
+                for r in records:
+                    platform_upper = r["platform"].upper()
+                    post_id = r.get("post_id", "")
+                    title = r.get("title", "")
+                    description = r.get("description", "")
+                    common = (
+                        now_str,
+                        r["hashtag"],
+                        r["trend_score"],
+                        *self._dims_to_columns(r["dimensions"]),
+                        _compress_raw(r["raw_data"]),
+                        r.get("author", ""),
+                        title[:200] if title else "",
+                        description[:500] if description else "",
+                        r.get("content_url", ""),
+                        r.get("cover_url", ""),
+                        r.get("lifecycle", "unknown"),
+                        r.get("priority", "P3"),
+                    )
+                    existing_id = existing_ids.get((platform_upper, post_id))
+                    if existing_id:
+                        update_rows.append(common + (existing_id,))
+                    else:
+                        record_id = f"{platform_upper}-{uuid4().hex}"
+                        insert_rows.append((
+                            record_id, now_str, platform_upper, r["hashtag"],
+                            r["trend_score"], *self._dims_to_columns(r["dimensions"]),
+                            _compress_raw(r["raw_data"]),
+                            r.get("author", ""), title[:200] if title else "",
+                            description[:500] if description else "", post_id,
+                            r.get("content_url", ""), r.get("cover_url", ""),
+                            r.get("lifecycle", "unknown"), r.get("priority", "P3"),
+                        ))
+
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    if update_rows:
+                        cursor.executemany("""
+                            UPDATE score_records SET
+                                timestamp = ?, hashtag = ?, trend_score = ?,
+                                dim_h = ?, dim_v = ?, dim_d = ?, dim_f = ?, dim_m = ?, dim_r = ?,
+                                raw_data = ?, author = ?,
+                                title = ?, description = ?, content_url = ?,
+                                cover_url = ?, lifecycle = ?, priority = ?
+                            WHERE id = ?
+                        """, update_rows)
+                    if insert_rows:
+                        # 探测和写入之间 staging 落盘可能抢先写入同一帖子，
+                        # 同样靠 ON CONFLICT 退化为更新
+                        cursor.executemany("""
+                            INSERT INTO score_records
+                            (id, timestamp, platform, hashtag, trend_score,
+                             dim_h, dim_v, dim_d, dim_f, dim_m, dim_r,
+                             raw_data, author, title, description, post_id, content_url, cover_url, lifecycle, priority)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(platform, post_id) WHERE post_id NOT IN ('', 'unknown')
+                            DO UPDATE SET
+                                timestamp = excluded.timestamp,
+                                hashtag = excluded.hashtag,
+                                trend_score = excluded.trend_score,
+                                dim_h = excluded.dim_h, dim_v = excluded.dim_v,
+                                dim_d = excluded.dim_d, dim_f = excluded.dim_f,
+                                dim_m = excluded.dim_m, dim_r = excluded.dim_r,
+                                raw_data = excluded.raw_data,
+                                author = excluded.author,
+                                title = excluded.title,
+                                description = excluded.description,
+                                content_url = excluded.content_url,
+                                cover_url = excluded.cover_url,
+                                lifecycle = excluded.lifecycle,
+                                priority = excluded.priority
+                        """, insert_rows)
+                    cursor.execute("COMMIT")
+                except Exception as e:
+                    cursor.execute("ROLLBACK")
+                    logger.error(f"add_records_bulk failed: {e}")
+                    raise
+
+            logger.debug(f"Bulk write: {len(insert_rows)} inserted, {len(update_rows)} updated")
+
+        return len(insert_rows), len(update_rows)
+
     def _cleanup_expired(self):
         """清理过期数据"""
         cutoff = datetime.utcnow() - timedelta(hours=self._retention_hours)
         cutoff_str = cutoff.isoformat()
-        
+
+        self._flush_hot()
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT COUNT(*) FROM score_records WHERE timestamp < ?", (cutoff_str,))
@@ -287,6 +723,7 @@ class HistoryStore:
             if count_before > 0:
                 cursor.execute("DELETE FROM score_records WHERE timestamp < ?", (cutoff_str,))
                 conn.commit()
+                self._invalidate_query_cache()
                 logger.info(f"Cleaned {count_before} expired records")
                 
                 # 删除超过1000条记录时，执行 VACUUM 释放磁盘空间
@@ -309,6 +746,18 @@ class HistoryStore:
         if hours_since_vacuum >= self._vacuum_interval_hours:
             self._vacuum_db()
     
+    # 非 raw_data 的查询列：避免 SELECT * 把大块压缩 BLOB 也读进来
+    _BASE_COLUMNS = (
+        "id, timestamp, platform, hashtag, trend_score, "
+        "dim_h, dim_v, dim_d, dim_f, dim_m, dim_r, "
+        "author, title, description, post_id, content_url, cover_url, "
+        "lifecycle, priority"
+    )
+
+    @classmethod
+    def _select_columns(cls, include_raw: bool) -> str:
+        return cls._BASE_COLUMNS + (", raw_data" if include_raw else "")
+
     def _row_to_dict(self, row: sqlite3.Row) -> dict:
         """将数据库行转换为字典"""
         result = {
@@ -317,194 +766,269 @@ class HistoryStore:
             "platform": row["platform"],
             "hashtag": row["hashtag"],
             "trend_score": row["trend_score"],
-            "dimensions": json.loads(row["dimensions"]),
-            "raw_data": json.loads(row["raw_data"]),
+            "dimensions": {
+                "H": row["dim_h"],
+                "V": row["dim_v"],
+                "D": row["dim_d"],
+                "F": row["dim_f"],
+                "M": row["dim_m"],
+                "R": row["dim_r"],
+            },
             "author": row["author"],
+            "title": row["title"] or "",
             "description": row["description"],
             "post_id": row["post_id"],
+            "content_url": row["content_url"] or "",
+            "cover_url": row["cover_url"] or "",
             "lifecycle": row["lifecycle"],
             "priority": row["priority"]
         }
-        # 兼容旧数据（没有 title, content_url 和 cover_url 字段）
-        try:
-            result["title"] = row["title"] or ""
-        except (IndexError, KeyError):
-            result["title"] = ""
-        try:
-            result["content_url"] = row["content_url"] or ""
-            result["cover_url"] = row["cover_url"] or ""
-        except (IndexError, KeyError):
-            result["content_url"] = ""
-            result["cover_url"] = ""
+        # raw_data 仅在查询显式投影该列时才解压
+        if "raw_data" in row.keys():
+            result["raw_data"] = _decompress_raw(row["raw_data"])
         return result
     
     def get_all(
         self,
         limit: int = 100,
         offset: int = 0,
-        sort_by_score: bool = True
+        sort_by_score: bool = True,
+        include_raw: bool = False
     ) -> List[dict]:
         """
         获取所有记录
-        
+
         Args:
             limit: 返回数量限制
             offset: 偏移量
             sort_by_score: 是否按分数排序
-            
+            include_raw: 是否读取并解压 raw_data 列
+
         Returns:
             List[dict]: 记录列表
         """
-        self._cleanup_expired()
-        
         order_by = "trend_score DESC" if sort_by_score else "timestamp DESC"
-        
+
+        self._flush_hot()
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(f"""
-                SELECT * FROM score_records 
+                SELECT {self._select_columns(include_raw)} FROM score_records
                 ORDER BY {order_by}
                 LIMIT ? OFFSET ?
             """, (limit, offset))
-            
+
             return [self._row_to_dict(row) for row in cursor.fetchall()]
     
     def get_by_platform(
         self,
         platform: str,
         limit: int = 50,
-        sort_by_score: bool = True
+        sort_by_score: bool = True,
+        include_raw: bool = False
     ) -> List[dict]:
         """
         按平台获取记录
-        
+
         Args:
             platform: 平台名称
             limit: 返回数量限制
             sort_by_score: 是否按分数排序
-            
+            include_raw: 是否读取并解压 raw_data 列
+
         Returns:
             List[dict]: 记录列表（带排名）
         """
-        self._cleanup_expired()
-        
         order_by = "trend_score DESC" if sort_by_score else "timestamp DESC"
-        
+
+        self._flush_hot()
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(f"""
-                SELECT * FROM score_records 
+                SELECT {self._select_columns(include_raw)},
+                       ROW_NUMBER() OVER (ORDER BY {order_by}) AS rank
+                FROM score_records
                 WHERE platform = ?
                 ORDER BY {order_by}
                 LIMIT ?
             """, (platform.upper(), limit))
-            
+
             result = []
-            for rank, row in enumerate(cursor.fetchall(), 1):
+            for row in cursor.fetchall():
                 data = self._row_to_dict(row)
-                data["rank"] = rank
+                data["rank"] = row["rank"]
                 result.append(data)
-            
+
             return result
     
-    def get_rankings(self, top_n: int = 20) -> Dict[str, dict]:
+    # 单条记录的 JSON 投影（由 SQLite 的 json_object 在 C 层构建）
+    _RECORD_JSON_EXPR = """json_object(
+        'id', id, 'timestamp', timestamp, 'platform', platform,
+        'hashtag', hashtag, 'trend_score', trend_score,
+        'dimensions', json_object(
+            'H', dim_h, 'V', dim_v, 'D', dim_d,
+            'F', dim_f, 'M', dim_m, 'R', dim_r),
+        'author', author, 'title', title, 'description', description,
+        'post_id', post_id, 'content_url', content_url, 'cover_url', cover_url,
+        'lifecycle', lifecycle, 'priority', priority)"""
+
+    def get_all_json(
+        self,
+        limit: int = 100,
+        offset: int = 0,
+        sort_by_score: bool = True
+    ) -> str:
+        """
+        获取所有记录，由 SQLite 直接生成响应 JSON 字符串
+
+        跳过 逐行 Row 对象 + json.loads + 框架再序列化 的往返，
+        返回值可直接作为 Response(content=..., media_type="application/json")。
+        """
+        order_by = "trend_score DESC" if sort_by_score else "timestamp DESC"
+
+        self._flush_hot()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT json_group_array(json({self._RECORD_JSON_EXPR}))
+                FROM (
+                    SELECT * FROM score_records
+                    ORDER BY {order_by}
+                    LIMIT ? OFFSET ?
+                )
+            """, (limit, offset))
+            return cursor.fetchone()[0]
+
+    def get_rankings_json(self, top_n: int = 20) -> str:
+        """
+        获取各平台排名，由 SQLite 直接生成响应 JSON 字符串
+
+        输出结构与 get_rankings 一致: {platform: {platform, records, total}}
+        """
+        self._flush_hot()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT json_group_object(platform, json(pdata))
+                FROM (
+                    SELECT platform, json_object(
+                        'platform', platform,
+                        'records', json_group_array(
+                            json(json_insert({self._RECORD_JSON_EXPR}, '$.rank', rank))),
+                        'total', COUNT(*)
+                    ) AS pdata
+                    FROM (
+                        SELECT * FROM (
+                            SELECT *, ROW_NUMBER() OVER (
+                                PARTITION BY platform ORDER BY trend_score DESC
+                            ) AS rank
+                            FROM score_records
+                        )
+                        WHERE rank <= ?
+                        ORDER BY platform, rank
+                    )
+                    GROUP BY platform
+                )
+            """, (top_n,))
+            return cursor.fetchone()[0]
+
+    def get_rankings(self, top_n: int = 20, include_raw: bool = False) -> Dict[str, dict]:
         """
         获取各平台排名
-        
+
         Args:
             top_n: 每个平台返回的数量
-            
+            include_raw: 是否读取并解压 raw_data 列
+
         Returns:
             Dict[str, dict]: 按平台分组的排名数据
         """
-        self._cleanup_expired()
-        
+        cached = self._cache_get(("rankings", top_n, include_raw))
+        if cached is not None:
+            return cached
+
+        self._flush_hot()
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            
-            # 获取所有平台
-            cursor.execute("SELECT DISTINCT platform FROM score_records")
-            platforms = [row[0] for row in cursor.fetchall()]
-            
+
+            # 单条窗口函数查询代替 1+P 次往返：
+            # ROW_NUMBER() 按平台分区直接算出排名
+            cursor.execute(f"""
+                SELECT * FROM (
+                    SELECT {self._select_columns(include_raw)},
+                           ROW_NUMBER() OVER (
+                        PARTITION BY platform ORDER BY trend_score DESC
+                    ) AS rank
+                    FROM score_records
+                )
+                WHERE rank <= ?
+                ORDER BY platform, rank
+            """, (top_n,))
+
             rankings = {}
-            
-            for platform in platforms:
-                cursor.execute("""
-                    SELECT * FROM score_records 
-                    WHERE platform = ?
-                    ORDER BY trend_score DESC
-                    LIMIT ?
-                """, (platform, top_n))
-                
-                records = []
-                for rank, row in enumerate(cursor.fetchall(), 1):
-                    data = self._row_to_dict(row)
-                    data["rank"] = rank
-                    records.append(data)
-                
-                rankings[platform] = {
-                    "platform": platform,
-                    "records": records,
-                    "total": len(records)
-                }
-            
-            return rankings
+            for row in cursor.fetchall():
+                platform = row["platform"]
+                entry = rankings.get(platform)
+                if entry is None:
+                    entry = rankings[platform] = {
+                        "platform": platform,
+                        "records": [],
+                        "total": 0
+                    }
+                data = self._row_to_dict(row)
+                data["rank"] = row["rank"]
+                entry["records"].append(data)
+                entry["total"] += 1
+
+            return self._cache_put(("rankings", top_n, include_raw), rankings)
     
     def get_stats(self) -> dict:
         """获取存储统计信息"""
-        self._cleanup_expired()
-        
+        cached = self._cache_get("stats")
+        if cached is not None:
+            return cached
+
+        self._flush_hot()
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            
-            # 总记录数
-            cursor.execute("SELECT COUNT(*) FROM score_records")
-            total = cursor.fetchone()[0]
-            
-            # 按平台统计
-            cursor.execute("""
-                SELECT platform, COUNT(*) as count, AVG(trend_score) as avg_score
-                FROM score_records
-                GROUP BY platform
-            """)
-            
-            platform_counts = {}
-            avg_scores = {}
-            for row in cursor.fetchall():
-                platform_counts[row["platform"]] = row["count"]
-                avg_scores[row["platform"]] = round(row["avg_score"], 2) if row["avg_score"] else 0
-            
-            # 最早和最新记录
-            cursor.execute("SELECT MIN(timestamp), MAX(timestamp) FROM score_records")
-            time_range = cursor.fetchone()
-            
-            # 按小时统计（估算爬取批次）
+
+            # 单条语句算齐全部统计：省去 5 次查询往返，
+            # 每平台计数/均分和小时直方图由 json_group_object/array 打包成一行
             cursor.execute("""
-                SELECT 
-                    strftime('%Y-%m-%d %H:00', timestamp) as hour,
-                    COUNT(*) as count
-                FROM score_records
-                GROUP BY hour
-                ORDER BY hour DESC
-                LIMIT 10
+                SELECT
+                    (SELECT COUNT(*) FROM score_records) AS total,
+                    (SELECT COUNT(DISTINCT hashtag) FROM score_records) AS unique_hashtags,
+                    (SELECT MIN(timestamp) FROM score_records) AS oldest,
+                    (SELECT MAX(timestamp) FROM score_records) AS newest,
+                    (SELECT json_group_object(platform, cnt) FROM (
+                        SELECT platform, COUNT(*) AS cnt
+                        FROM score_records GROUP BY platform
+                    )) AS platform_counts,
+                    (SELECT json_group_object(platform, avg_score) FROM (
+                        SELECT platform, ROUND(AVG(trend_score), 2) AS avg_score
+                        FROM score_records GROUP BY platform
+                    )) AS avg_scores,
+                    (SELECT json_group_array(json_object('hour', hour, 'count', cnt)) FROM (
+                        SELECT strftime('%Y-%m-%d %H:00', timestamp) AS hour, COUNT(*) AS cnt
+                        FROM score_records
+                        GROUP BY hour
+                        ORDER BY hour DESC
+                        LIMIT 10
+                    )) AS hourly_stats
             """)
-            hourly_stats = [{"hour": row[0], "count": row[1]} for row in cursor.fetchall()]
-            
-            # 唯一 hashtag 数量
-            cursor.execute("SELECT COUNT(DISTINCT hashtag) FROM score_records")
-            unique_hashtags = cursor.fetchone()[0]
-            
-            return {
-                "total_records": total,
+            row = cursor.fetchone()
+
+            return self._cache_put("stats", {
+                "total_records": row["total"],
                 "retention_hours": self._retention_hours,
-                "platforms": platform_counts,
-                "average_scores": avg_scores,
-                "oldest_record": time_range[0],
-                "newest_record": time_range[1],
+                "platforms": _json_loads(row["platform_counts"] or "{}"),
+                "average_scores": _json_loads(row["avg_scores"] or "{}"),
+                "oldest_record": row["oldest"],
+                "newest_record": row["newest"],
                 "db_path": self._db_path,
-                "unique_hashtags": unique_hashtags,
-                "hourly_stats": hourly_stats,
-            }
+                "unique_hashtags": row["unique_hashtags"],
+                "hourly_stats": _json_loads(row["hourly_stats"] or "[]"),
+            })
     
     def get_time_series(
         self,
@@ -525,68 +1049,53 @@ class HistoryStore:
         """
         cutoff = datetime.utcnow() - timedelta(minutes=minutes)
         cutoff_str = cutoff.isoformat()
-        
+
+        self._flush_hot()
+        # 聚合下推到 SQL：按 epoch 秒向下取整到间隔，SQLite 在 C 层完成
+        # avg/min/max/count，避免逐行 fromisoformat + Python 字典聚合
+        bucket_expr = "time((CAST(strftime('%s', timestamp) AS INTEGER) / ?) * ?, 'unixepoch')"
+        conditions = "timestamp > ?"
+        params: List[Any] = [interval_seconds, interval_seconds, cutoff_str]
+        if platform:
+            conditions += " AND platform = ?"
+            params.append(platform.upper())
+
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            
-            if platform:
-                cursor.execute("""
-                    SELECT timestamp, trend_score FROM score_records
-                    WHERE platform = ? AND timestamp > ?
-                    ORDER BY timestamp
-                """, (platform.upper(), cutoff_str))
-            else:
-                cursor.execute("""
-                    SELECT timestamp, trend_score FROM score_records
-                    WHERE timestamp > ?
-                    ORDER BY timestamp
-                """, (cutoff_str,))
-            
-            rows = cursor.fetchall()
-            
-            if not rows:
-                return []
-            
-            # 按时间间隔聚合
-            buckets: Dict[str, List[float]] = {}
-            
-            for row in rows:
-                try:
-                    ts = datetime.fromisoformat(row["timestamp"])
-                    # 向下取整到最近的间隔
-                    bucket_time = ts.replace(
-                        second=(ts.second // interval_seconds) * interval_seconds,
-                        microsecond=0
-                    )
-                    bucket_key = bucket_time.strftime("%H:%M:%S")
-                    
-                    if bucket_key not in buckets:
-                        buckets[bucket_key] = []
-                    buckets[bucket_key].append(row["trend_score"])
-                except Exception:
-                    continue
-            
-            # 计算每个桶的统计值
-            result = []
-            for time_key in sorted(buckets.keys()):
-                scores = buckets[time_key]
-                result.append({
-                    "time": time_key,
-                    "avg_score": round(sum(scores) / len(scores), 2),
-                    "max_score": round(max(scores), 2),
-                    "min_score": round(min(scores), 2),
-                    "count": len(scores)
-                })
-            
-            return result
+            cursor.execute(f"""
+                SELECT
+                    {bucket_expr} AS time,
+                    ROUND(AVG(trend_score), 2) AS avg_score,
+                    ROUND(MAX(trend_score), 2) AS max_score,
+                    ROUND(MIN(trend_score), 2) AS min_score,
+                    COUNT(*) AS count
+                FROM score_records
+                WHERE {conditions}
+                GROUP BY time
+                ORDER BY time
+            """, params)
+
+            return [
+                {
+                    "time": row["time"],
+                    "avg_score": row["avg_score"],
+                    "max_score": row["max_score"],
+                    "min_score": row["min_score"],
+                    "count": row["count"]
+                }
+                for row in cursor.fetchall()
+            ]
     
     def clear_all(self):
         """清空所有数据（谨慎使用）"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            with self._hot_lock:
+                cursor.execute("DELETE FROM hot.score_records")
+                self._hot_pending = 0
             cursor.execute("DELETE FROM score_records")
             conn.commit()
-            self._record_count = 0
+            self._invalidate_query_cache()
             logger.warning("All records cleared from database")
         # 清空后立即释放空间
         self._vacuum_db()
@@ -602,12 +1111,12 @@ class HistoryStore:
             file_size = os.path.getsize(self._db_path)
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("PRAGMA page_count")
-                page_count = cursor.fetchone()[0]
-                cursor.execute("PRAGMA freelist_count")
-                free_pages = cursor.fetchone()[0]
-                cursor.execute("PRAGMA page_size")
-                page_size = cursor.fetchone()[0]
+                # pragma 表值函数：一次查询拿齐三个指标，监控轮询少两次往返
+                cursor.execute("""
+                    SELECT page_count, freelist_count, page_size
+                    FROM pragma_page_count(), pragma_freelist_count(), pragma_page_size()
+                """)
+                page_count, free_pages, page_size = cursor.fetchone()
             
             return {
                 "file_size_bytes": file_size,
@@ -623,9 +1132,12 @@ class HistoryStore:
             return {"error": str(e)}
     
     def maintenance(self):
-        """执行数据库维护：清理过期数据 + VACUUM"""
+        """执行数据库维护：清理过期数据 + VACUUM + 更新查询计划统计"""
         self._cleanup_expired()
         self._vacuum_db()
+        with self._get_connection() as conn:
+            conn.execute("PRAGMA analysis_limit=400")
+            conn.execute("PRAGMA optimize")
         return self.get_db_size()
 
 
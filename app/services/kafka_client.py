@@ -5,12 +5,22 @@ Handles all Kafka producer and consumer operations.
 
 import json
 import logging
+import threading
 from typing import Optional, Callable, Any
 from confluent_kafka import Producer, Consumer, KafkaError, KafkaException
 from confluent_kafka.admin import AdminClient
 
 from app.config import get_settings
 
+try:
+    import orjson
+
+    def _json_dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:  # pragma: no cover
+    def _json_dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,6 +35,8 @@ class KafkaClient:
         self._producer: Optional[Producer] = None
         self._consumer: Optional[Consumer] = None
         self._admin: Optional[AdminClient] = None
+        self._poll_thread: Optional[threading.Thread] = None
+        self._poll_stop = threading.Event()
 
     @property
     def producer(self) -> Producer:
@@ -32,9 +44,29 @@ class KafkaClient:
         if self._producer is None:
             config = self._settings.get_producer_config()
             self._producer = Producer(config)
+            self._start_poll_thread()
             logger.info("Kafka producer initialized")
         return self._producer
 
+    def _start_poll_thread(self):
+        """Run delivery-report polling on a background thread."""
+        if self._poll_thread is not None:
+            return
+        self._poll_thread = threading.Thread(
+            target=self._poll_loop,
+            name="kafka-producer-poll",
+            daemon=True
+        )
+        self._poll_thread.start()
+
+    def _poll_loop(self):
+        while not self._poll_stop.is_set():
+            try:
+                self._producer.poll(0.1)
+            except Exception as e:
+                logger.error(f"Producer poll error: {e}")
+                self._poll_stop.wait(1.0)
+
     @property
     def admin(self) -> AdminClient:
         """Lazy initialization of Kafka admin client."""
@@ -122,12 +154,11 @@ class KafkaClient:
             bool: True if message was queued successfully
         """
         try:
-            # Serialize value to JSON if it's a dict
+            # Serialize value straight to bytes if it's a dict
             if isinstance(value, dict):
-                value = json.dumps(value)
-
-            # Convert to bytes
-            value_bytes = value.encode("utf-8") if isinstance(value, str) else value
+                value_bytes = _json_dumps_bytes(value)
+            else:
+                value_bytes = value.encode("utf-8") if isinstance(value, str) else value
             key_bytes = key.encode("utf-8") if key else None
 
             # Prepare headers
@@ -145,9 +176,6 @@ class KafkaClient:
                 callback=callback or self._default_callback
             )
 
-            # Trigger delivery reports
-            self.producer.poll(0)
-
             return True
 
         except KafkaException as e:
@@ -181,6 +209,10 @@ class KafkaClient:
 
     def close(self):
         """Close all Kafka connections."""
+        self._poll_stop.set()
+        if self._poll_thread:
+            self._poll_thread.join(timeout=2.0)
+            self._poll_thread = None
         if self._producer:
             self._producer.flush(timeout=5.0)
             logger.info("Kafka producer closed")
@@ -12,14 +12,18 @@ Smart History Store - 智能历史数据存储服务
 - 使用连接池避免频繁创建/销毁连接
 - 读操作无锁，写操作使用细粒度锁
 - 支持批量写入减少事务次数
+
+事务约定：isolation_level=None（自动提交），写事务必须显式
+conn.execute("BEGIN IMMEDIATE") 先拿写锁，避免读事务升级写锁时的
+SQLITE_BUSY 竞争；提交/回滚走 conn.commit()/conn.rollback()。
 """
 
 import logging
 import sqlite3
-import json
 import os
 import threading
-import queue
+import time
+from collections import deque
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 from contextlib import contextmanager
@@ -36,6 +40,424 @@ DB_PATH = os.path.join(DB_DIR, "smart_history.db")
 # 连接池大小
 POOL_SIZE = 3
 
+# 每隔多少次写连接归还跑一次 PRAGMA optimize，维护 sqlite_stat1 统计
+_OPTIMIZE_EVERY = 1000
+
+# 每轮清理最多通过 incremental_vacuum 归还的页数
+_INCR_VACUUM_PAGES = 1024
+
+# 写路径上 platform/tag 的规整结果缓存：高频重复传入同几个字符串，
+# 省掉每次调用的 lower()/lstrip() 分配
+_platform_cache: Dict[str, str] = {}
+_tag_cache: Dict[str, str] = {}
+_NORM_CACHE_MAX = 4096
+
+
+def _norm_platform(platform: str) -> str:
+    cached = _platform_cache.get(platform)
+    if cached is None:
+        cached = platform.lower()
+        if len(_platform_cache) < _NORM_CACHE_MAX:
+            _platform_cache[platform] = cached
+    return cached
+
+
+def _norm_tag(tag: str) -> str:
+    cached = _tag_cache.get(tag)
+    if cached is None:
+        cached = tag.lower().lstrip("#")
+        if len(_tag_cache) < _NORM_CACHE_MAX:
+            _tag_cache[tag] = cached
+    return cached
+
+
+# 秒级缓存的时间戳：同一秒内的批量写共用一个字符串，
+# 不必每行都走 datetime 格式化
+_iso_cache: Tuple[int, str] = (0, "")
+
+
+def _iso_now() -> str:
+    global _iso_cache
+    second = int(time.time())
+    if second != _iso_cache[0]:
+        _iso_cache = (second, datetime.utcnow().isoformat(timespec="seconds"))
+    return _iso_cache[1]
+
+# 维度集合固定为 H/V/D/F/M/R 六个键：按 REAL 列存储，
+# 写入免序列化、读取免 JSON 解析（dimensions TEXT 列仅为旧库保留）
+_DIM_KEYS = ("H", "V", "D", "F", "M", "R")
+_DIM_COLUMNS = ("dim_h", "dim_v", "dim_d", "dim_f", "dim_m", "dim_r")
+_DIM_ZEROS = (0.0,) * len(_DIM_KEYS)
+
+
+def _dim_params(dimensions: Optional[Dict[str, float]]) -> Tuple[float, ...]:
+    """把 dimensions dict 展开成按 _DIM_COLUMNS 顺序的绑定参数"""
+    if not dimensions:
+        return _DIM_ZEROS
+    return tuple(dimensions.get(k, 0) or 0 for k in _DIM_KEYS)
+
+
+def _batch_row_params(data: Dict[str, Any], unique_id: str, now: str) -> Tuple:
+    """把一条批量写入数据转成 _SQL_BATCH_UPSERT_POST 的绑定参数"""
+    # 属性查找提成局部变量：热循环里省掉每次 LOAD_METHOD
+    get = data.get
+    sget = (get("stats") or {}).get
+    title = get("title", "")
+    description = get("description", "")
+    return (
+        unique_id, _norm_platform(get("platform", "unknown")),
+        _norm_tag(get("tag", "")), get("post_id", ""),
+        get("author") or None,
+        title[:200] if title else None,
+        description[:500] if description else None,
+        get("content_url") or None,
+        get("cover_url") or None,
+        sget("views") or 0, sget("likes") or 0,
+        sget("comments") or 0, sget("shares") or 0,
+        sget("saves") or 0,
+        get("trend_score", 0),
+        *_dim_params(get("dimensions")),
+        get("lifecycle", "unknown"),
+        get("priority", "P3"),
+        now, now, get("post_created_at", "")
+    )
+
+
+def _dims_from_row(row) -> Dict[str, float]:
+    """从 dim_* 列重建 dimensions dict"""
+    return {
+        "H": row["dim_h"], "V": row["dim_v"], "D": row["dim_d"],
+        "F": row["dim_f"], "M": row["dim_m"], "R": row["dim_r"],
+    }
+
+
+# 热路径 SQL 预先定义为模块常量：同一字符串对象反复传入 execute 时
+# 能稳定命中连接的语句缓存，parser/planner 每种语句只跑一次
+
+# upsert 单语句化：DO UPDATE 里的 posts.* 读的是旧行，
+# prev_* = posts.* 原子地留住上一轮数值；RETURNING 把判定
+# 新旧帖和旧 stats 所需的列一并带回，省掉先行 SELECT。
+# 文本列的"空值不覆盖旧值"在 Python 侧做：空串传 None，
+# SQL 里单个 COALESCE 即可，不必每列跑 NULLIF + COALESCE 两个函数
+_SQL_UPSERT_POST_BODY = """
+    INSERT INTO posts
+    (id, platform, tag, post_id, author, title, description, content_url, cover_url,
+     views, likes, comments, shares, saves,
+     prev_views, prev_likes, prev_comments, prev_shares, prev_saves,
+     trend_score, dim_h, dim_v, dim_d, dim_f, dim_m, dim_r, lifecycle, priority,
+     first_seen_at, last_updated_at, post_created_at, update_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, 0, 0, 0, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+    ON CONFLICT(platform, post_id) DO UPDATE SET
+        prev_views = posts.views, prev_likes = posts.likes,
+        prev_comments = posts.comments, prev_shares = posts.shares,
+        prev_saves = posts.saves,
+        tag = excluded.tag,
+        views = excluded.views, likes = excluded.likes,
+        comments = excluded.comments, shares = excluded.shares,
+        saves = excluded.saves,
+        author = COALESCE(excluded.author, posts.author),
+        title = COALESCE(excluded.title, posts.title),
+        description = COALESCE(excluded.description, posts.description),
+        content_url = COALESCE(excluded.content_url, posts.content_url),
+        cover_url = COALESCE(excluded.cover_url, posts.cover_url),
+        trend_score = excluded.trend_score,
+        dim_h = excluded.dim_h, dim_v = excluded.dim_v, dim_d = excluded.dim_d,
+        dim_f = excluded.dim_f, dim_m = excluded.dim_m, dim_r = excluded.dim_r,
+        lifecycle = excluded.lifecycle,
+        priority = excluded.priority,
+        last_updated_at = excluded.last_updated_at,
+        update_count = posts.update_count + 1
+"""
+
+_SQL_UPSERT_POST = _SQL_UPSERT_POST_BODY + \
+    "    RETURNING update_count, prev_views, prev_likes, prev_comments, prev_shares, prev_saves\n"
+
+# 批量路径复用同一个 upsert（executemany 不支持 RETURNING，
+# 新增/更新计数由批前的 id 探查承担）
+_SQL_BATCH_UPSERT_POST = _SQL_UPSERT_POST_BODY
+
+_SQL_UPSERT_TAG = """
+    INSERT INTO tag_scores
+    (id, platform, tag,
+     total_views, total_likes, total_comments, total_shares, total_saves, post_count,
+     prev_total_views, prev_total_likes, prev_total_comments, prev_total_shares, prev_total_saves,
+     trend_score, dim_h, dim_v, dim_d, dim_f, dim_m, dim_r, lifecycle, priority,
+     freshness_rate, activity_level, new_posts_count,
+     first_seen_at, last_updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(platform, tag) DO UPDATE SET
+        total_views = excluded.total_views,
+        total_likes = excluded.total_likes,
+        total_comments = excluded.total_comments,
+        total_shares = excluded.total_shares,
+        total_saves = excluded.total_saves,
+        post_count = excluded.post_count,
+        prev_total_views = excluded.prev_total_views,
+        prev_total_likes = excluded.prev_total_likes,
+        prev_total_comments = excluded.prev_total_comments,
+        prev_total_shares = excluded.prev_total_shares,
+        prev_total_saves = excluded.prev_total_saves,
+        trend_score = excluded.trend_score,
+        dim_h = excluded.dim_h, dim_v = excluded.dim_v, dim_d = excluded.dim_d,
+        dim_f = excluded.dim_f, dim_m = excluded.dim_m, dim_r = excluded.dim_r,
+        lifecycle = excluded.lifecycle,
+        priority = excluded.priority,
+        freshness_rate = excluded.freshness_rate,
+        activity_level = excluded.activity_level,
+        new_posts_count = excluded.new_posts_count,
+        last_updated_at = excluded.last_updated_at
+"""
+
+# tag 聚合的增量维护：upsert_post 写帖子时同步把增量记到 tag_scores，
+# 读侧就不用每次对 posts 做全量 SUM 扫描
+_SQL_TAG_AGG_FETCH = """
+    SELECT total_views, total_likes, total_comments, total_shares, total_saves,
+           prev_total_views, prev_total_likes, prev_total_comments,
+           prev_total_shares, prev_total_saves,
+           post_count, new_posts_count
+    FROM tag_scores WHERE platform = ? AND tag = ?
+"""
+
+# upsert_post 的聚合维护单语句：必须在帖子 upsert 之前执行——
+# 相关子查询读的是帖子的旧行，新帖各子查询为 NULL 即退化成纯插入增量
+_SQL_TAG_AGG_UPSERT_FOR_POST = """
+    INSERT INTO tag_scores
+    (id, platform, tag,
+     total_views, total_likes, total_comments, total_shares, total_saves,
+     post_count, new_posts_count, first_seen_at, last_updated_at)
+    VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, 1, 1, ?9, ?10)
+    ON CONFLICT(platform, tag) DO UPDATE SET
+        total_views = total_views + ?4
+            - COALESCE((SELECT views FROM posts WHERE platform = ?2 AND post_id = ?11), 0),
+        total_likes = total_likes + ?5
+            - COALESCE((SELECT likes FROM posts WHERE platform = ?2 AND post_id = ?11), 0),
+        total_comments = total_comments + ?6
+            - COALESCE((SELECT comments FROM posts WHERE platform = ?2 AND post_id = ?11), 0),
+        total_shares = total_shares + ?7
+            - COALESCE((SELECT shares FROM posts WHERE platform = ?2 AND post_id = ?11), 0),
+        total_saves = total_saves + ?8
+            - COALESCE((SELECT saves FROM posts WHERE platform = ?2 AND post_id = ?11), 0),
+        prev_total_views = prev_total_views + COALESCE(
+            (SELECT views - prev_views FROM posts WHERE platform = ?2 AND post_id = ?11), 0),
+        prev_total_likes = prev_total_likes + COALESCE(
+            (SELECT likes - prev_likes FROM posts WHERE platform = ?2 AND post_id = ?11), 0),
+        prev_total_comments = prev_total_comments + COALESCE(
+            (SELECT comments - prev_comments FROM posts WHERE platform = ?2 AND post_id = ?11), 0),
+        prev_total_shares = prev_total_shares + COALESCE(
+            (SELECT shares - prev_shares FROM posts WHERE platform = ?2 AND post_id = ?11), 0),
+        prev_total_saves = prev_total_saves + COALESCE(
+            (SELECT saves - prev_saves FROM posts WHERE platform = ?2 AND post_id = ?11), 0),
+        post_count = post_count + (NOT EXISTS(
+            SELECT 1 FROM posts WHERE platform = ?2 AND post_id = ?11)),
+        new_posts_count = new_posts_count + (CASE
+            WHEN NOT EXISTS(SELECT 1 FROM posts WHERE platform = ?2 AND post_id = ?11) THEN 1
+            WHEN (SELECT update_count FROM posts WHERE platform = ?2 AND post_id = ?11) = 1 THEN -1
+            ELSE 0 END),
+        last_updated_at = ?9
+"""
+
+# 从 posts 回源重算某个（或全部）tag 的聚合：迁移旧库、批量写入
+# 和过期清理后用它把缓存拉回和真实数据一致
+_TAG_AGG_REBUILD_TMPL = """
+    INSERT INTO tag_scores
+    (id, platform, tag,
+     total_views, total_likes, total_comments, total_shares, total_saves,
+     prev_total_views, prev_total_likes, prev_total_comments,
+     prev_total_shares, prev_total_saves,
+     post_count, new_posts_count, first_seen_at, last_updated_at)
+    SELECT platform || ':' || tag, platform, tag,
+           COALESCE(SUM(views), 0), COALESCE(SUM(likes), 0),
+           COALESCE(SUM(comments), 0), COALESCE(SUM(shares), 0),
+           COALESCE(SUM(saves), 0),
+           COALESCE(SUM(prev_views), 0), COALESCE(SUM(prev_likes), 0),
+           COALESCE(SUM(prev_comments), 0), COALESCE(SUM(prev_shares), 0),
+           COALESCE(SUM(prev_saves), 0),
+           COUNT(*),
+           COALESCE(SUM(CASE WHEN update_count = 1 THEN 1 ELSE 0 END), 0),
+           ?, ?
+    FROM posts {where}
+    GROUP BY platform, tag
+    ON CONFLICT(platform, tag) DO UPDATE SET
+        total_views = excluded.total_views,
+        total_likes = excluded.total_likes,
+        total_comments = excluded.total_comments,
+        total_shares = excluded.total_shares,
+        total_saves = excluded.total_saves,
+        prev_total_views = excluded.prev_total_views,
+        prev_total_likes = excluded.prev_total_likes,
+        prev_total_comments = excluded.prev_total_comments,
+        prev_total_shares = excluded.prev_total_shares,
+        prev_total_saves = excluded.prev_total_saves,
+        post_count = excluded.post_count,
+        new_posts_count = excluded.new_posts_count,
+        last_updated_at = excluded.last_updated_at
+"""
+
+_SQL_TAG_AGG_REBUILD_ONE = _TAG_AGG_REBUILD_TMPL.format(
+    where="WHERE platform = ? AND tag = ?"
+)
+_SQL_TAG_AGG_REBUILD_ALL = _TAG_AGG_REBUILD_TMPL.format(where="")
+
+# 过期清理按块删：每块一个隐式事务，写锁按块释放，
+# 爬虫的 upsert 可以在块间穿插而不是等整张表删完
+_CLEANUP_CHUNK_SIZE = 1000
+
+_SQL_DELETE_EXPIRED_CHUNK = f"""
+    DELETE FROM posts WHERE id IN (
+        SELECT id FROM posts WHERE last_updated_at < ?
+        ORDER BY last_updated_at LIMIT {_CLEANUP_CHUNK_SIZE})
+"""
+
+# 改 tag 后旧 tag 可能一个帖子都不剩：重算补不到空组，定点归零
+_SQL_TAG_AGG_ZERO_ONE = """
+    UPDATE tag_scores SET
+        total_views = 0, total_likes = 0, total_comments = 0,
+        total_shares = 0, total_saves = 0,
+        prev_total_views = 0, prev_total_likes = 0, prev_total_comments = 0,
+        prev_total_shares = 0, prev_total_saves = 0,
+        post_count = 0, new_posts_count = 0
+    WHERE platform = ?1 AND tag = ?2
+      AND NOT EXISTS (
+        SELECT 1 FROM posts WHERE platform = ?1 AND tag = ?2
+      )
+"""
+
+# 帖子全部被清理掉的 tag：聚合归零（行本身由过期清理决定去留）
+_SQL_TAG_AGG_ZERO_ORPHANS = """
+    UPDATE tag_scores SET
+        total_views = 0, total_likes = 0, total_comments = 0,
+        total_shares = 0, total_saves = 0,
+        prev_total_views = 0, prev_total_likes = 0, prev_total_comments = 0,
+        prev_total_shares = 0, prev_total_saves = 0,
+        post_count = 0, new_posts_count = 0
+    WHERE NOT EXISTS (
+        SELECT 1 FROM posts
+        WHERE posts.platform = tag_scores.platform
+          AND posts.tag = tag_scores.tag
+    )
+"""
+
+# 批量更新：prev_* 交换在 SQL 内完成，executemany 逐行套用
+_RANKING_COLS = (
+    "id, platform, tag, post_id, author, title, description, "
+    "content_url, cover_url, trend_score, "
+    "dim_h, dim_v, dim_d, dim_f, dim_m, dim_r, "
+    "lifecycle, priority, "
+    "views, likes, comments, shares, saves, "
+    "update_count, last_updated_at"
+)
+
+_SQL_RANKING_BY_PLATFORM = (
+    f"SELECT {_RANKING_COLS} FROM posts "
+    "WHERE platform = ? AND trend_score >= ? "
+    "ORDER BY trend_score DESC LIMIT ?"
+)
+
+_SQL_RANKING_ALL = (
+    f"SELECT {_RANKING_COLS} FROM posts "
+    "WHERE trend_score >= ? "
+    "ORDER BY trend_score DESC LIMIT ?"
+)
+
+
+def _ranking_row_to_dict(row: Tuple) -> Dict[str, Any]:
+    """把 _RANKING_COLS 顺序的位置元组转成 API 返回的 dict"""
+    (row_id, row_platform, row_tag, post_id, author, title, description,
+     content_url, cover_url, trend_score,
+     dim_h, dim_v, dim_d, dim_f, dim_m, dim_r,
+     lifecycle, priority,
+     views, likes, comments, shares, saves,
+     update_count, last_updated_at) = row
+    return {
+        "id": row_id,
+        "platform": row_platform,
+        "tag": row_tag,
+        "post_id": post_id,
+        "author": author or "",
+        "title": title or "",
+        "description": description or "",
+        "content_url": content_url or "",
+        "cover_url": cover_url or "",
+        "trend_score": trend_score,
+        "dimensions": {"H": dim_h, "V": dim_v, "D": dim_d,
+                       "F": dim_f, "M": dim_m, "R": dim_r},
+        "lifecycle": lifecycle,
+        "priority": priority,
+        "stats": {
+            "views": views,
+            "likes": likes,
+            "comments": comments,
+            "shares": shares,
+            "saves": saves
+        },
+        "update_count": update_count,
+        "last_updated_at": last_updated_at
+    }
+
+
+def _tag_score_row_to_dict(row: Tuple) -> Dict[str, Any]:
+    """把 _TAG_SCORES_COLS 顺序的位置元组转成 API 返回的 dict"""
+    (row_platform, row_tag, trend_score,
+     dim_h, dim_v, dim_d, dim_f, dim_m, dim_r,
+     lifecycle, priority, post_count,
+     total_views, total_likes, total_comments, total_shares, total_saves,
+     freshness, activity, new_posts, last_updated_at) = row
+    return {
+        "platform": row_platform,
+        "tag": row_tag,
+        "trend_score": trend_score,
+        "dimensions": {"H": dim_h, "V": dim_v, "D": dim_d,
+                       "F": dim_f, "M": dim_m, "R": dim_r},
+        "lifecycle": lifecycle,
+        "priority": priority,
+        "post_count": post_count,
+        "stats": {
+            "views": total_views,
+            "likes": total_likes,
+            "comments": total_comments,
+            "shares": total_shares,
+            "saves": total_saves
+        },
+        # 活跃度信息
+        "activity": {
+            "freshness_rate": freshness,
+            "activity_level": activity,
+            "new_posts": new_posts,
+        },
+        "last_updated_at": last_updated_at
+    }
+
+
+# get_tag_scores 的 WHERE 组合固定为 4 个变体（platform × activity），
+# 避免 f-string 动态拼接导致语句缓存永不命中；列顺序与
+# _tag_score_row_to_dict 的位置解包严格对应
+_TAG_SCORES_COLS = (
+    "platform, tag, trend_score, "
+    "dim_h, dim_v, dim_d, dim_f, dim_m, dim_r, "
+    "lifecycle, priority, post_count, "
+    "total_views, total_likes, total_comments, total_shares, total_saves, "
+    "freshness_rate, activity_level, new_posts_count, last_updated_at"
+)
+
+_SQL_TAG_SCORES = {
+    (False, False): (
+        f"SELECT {_TAG_SCORES_COLS} FROM tag_scores WHERE trend_score >= ? "
+        "ORDER BY trend_score DESC LIMIT ?"
+    ),
+    (True, False): (
+        f"SELECT {_TAG_SCORES_COLS} FROM tag_scores WHERE trend_score >= ? AND platform = ? "
+        "ORDER BY trend_score DESC LIMIT ?"
+    ),
+    (False, True): (
+        f"SELECT {_TAG_SCORES_COLS} FROM tag_scores WHERE trend_score >= ? AND activity_level = ? "
+        "ORDER BY trend_score DESC LIMIT ?"
+    ),
+    (True, True): (
+        f"SELECT {_TAG_SCORES_COLS} FROM tag_scores WHERE trend_score >= ? AND platform = ? "
+        "AND activity_level = ? ORDER BY trend_score DESC LIMIT ?"
+    ),
+}
+
 
 class ConnectionPool:
     """
@@ -44,12 +466,17 @@ class ConnectionPool:
     SQLite 在 WAL 模式下支持多个读连接和一个写连接并发
     """
 
-    def __init__(self, db_path: str, pool_size: int = POOL_SIZE):
+    def __init__(self, db_path: str, pool_size: int = POOL_SIZE, readonly: bool = False):
         self._db_path = db_path
-        self._pool = queue.Queue(maxsize=pool_size)
+        # deque + Condition 取代 queue.Queue：取/还连接只过一把锁，
+        # 且 pop() 是 LIFO——刚用过的连接优先复用，页缓存/语句缓存都是热的
+        self._pool: deque = deque()
+        self._cond = threading.Condition()
         self._pool_size = pool_size
+        self._readonly = readonly
         self._lock = threading.Lock()
         self._initialized = False
+        self._ops_since_optimize = 0
 
     def _create_connection(self) -> sqlite3.Connection:
         """创建一个新的数据库连接"""
@@ -57,17 +484,33 @@ class ConnectionPool:
             self._db_path,
             timeout=30.0,
             check_same_thread=False,  # 允许跨线程使用
-            isolation_level=None  # 自动提交模式，手动控制事务
+            isolation_level=None,  # 自动提交模式，手动控制事务
+            cached_statements=256  # 扩大语句缓存，热路径 SQL 免重复编译
         )
         conn.row_factory = sqlite3.Row
+        # 必须是建库后的第一条语句：文件一旦被其他 PRAGMA 初始化，
+        # auto_vacuum 就只能等全量 VACUUM 时切换（见 _init_db 的迁移）
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
         # 启用 WAL 模式 - 大幅提升并发性能
         conn.execute("PRAGMA journal_mode=WAL")
         # 设置同步模式为 NORMAL（平衡性能和安全）
         conn.execute("PRAGMA synchronous=NORMAL")
-        # 增加缓存大小（默认 2000 页，约 8MB）
-        conn.execute("PRAGMA cache_size=4000")
+        # WAL 累积约 1000 页即自动 checkpoint，控制 WAL 文件体积
+        conn.execute("PRAGMA wal_autocheckpoint=1000")
+        # 增加缓存大小（负数表示 KB，这里约 64MB）
+        conn.execute("PRAGMA cache_size=-64000")
+        # 写锁冲突时等待而不是立刻返回 SQLITE_BUSY
+        conn.execute("PRAGMA busy_timeout=5000")
+        # GROUP BY / ORDER BY 的临时表放内存，不落盘
+        conn.execute("PRAGMA temp_store=MEMORY")
         # 启用外键约束
         conn.execute("PRAGMA foreign_keys=ON")
+        if self._db_path != ":memory:":
+            # mmap 读路径：直接从页缓存取页，省掉 read() 系统调用
+            conn.execute("PRAGMA mmap_size=268435456")
+        if self._readonly:
+            # 读连接显式只读，误用时立刻报错而不是抢写锁
+            conn.execute("PRAGMA query_only=1")
         return conn
 
     def initialize(self):
@@ -77,9 +520,9 @@ class ConnectionPool:
         with self._lock:
             if self._initialized:
                 return
-            for _ in range(self._pool_size):
-                conn = self._create_connection()
-                self._pool.put(conn)
+            with self._cond:
+                for _ in range(self._pool_size):
+                    self._pool.append(self._create_connection())
             self._initialized = True
             logger.info(f"连接池已初始化: {self._pool_size} 个连接, WAL 模式已启用")
 
@@ -90,32 +533,49 @@ class ConnectionPool:
             self.initialize()
 
         conn = None
-        try:
+        with self._cond:
             # 尝试从池中获取连接，最多等待 10 秒
-            conn = self._pool.get(timeout=10.0)
-            yield conn
-        except queue.Empty:
+            if not self._pool:
+                self._cond.wait(timeout=10.0)
+            if self._pool:
+                conn = self._pool.pop()
+        if conn is None:
             # 池中没有可用连接，创建临时连接
             logger.warning("连接池已满，创建临时连接")
             conn = self._create_connection()
+            try:
+                yield conn
+            finally:
+                conn.close()  # 临时连接用完就关闭
+            return
+        try:
             yield conn
-            conn.close()  # 临时连接用完就关闭
-            conn = None
         finally:
-            if conn is not None:
-                try:
-                    self._pool.put_nowait(conn)
-                except queue.Full:
-                    conn.close()
+            if not self._readonly:
+                # 连接常驻池中不会触发"close 时收集统计"，改为按写入量
+                # 周期性跑 PRAGMA optimize，让 planner 跟上数据分布的变化
+                self._ops_since_optimize += 1
+                if self._ops_since_optimize >= _OPTIMIZE_EVERY:
+                    self._ops_since_optimize = 0
+                    try:
+                        conn.execute("PRAGMA optimize")
+                    except sqlite3.Error as e:
+                        logger.warning(f"PRAGMA optimize 失败: {e}")
+            with self._cond:
+                self._pool.append(conn)
+                self._cond.notify()
 
     def close_all(self):
         """关闭所有连接"""
-        while not self._pool.empty():
-            try:
-                conn = self._pool.get_nowait()
+        with self._cond:
+            while self._pool:
+                conn = self._pool.pop()
+                if not self._readonly:
+                    try:
+                        conn.execute("PRAGMA optimize")
+                    except sqlite3.Error:
+                        pass
                 conn.close()
-            except queue.Empty:
-                break
         self._initialized = False
         logger.info("连接池已关闭")
 
@@ -137,28 +597,49 @@ class SmartHistoryStore:
     def __init__(self, db_path: str = DB_PATH, retention_hours: int = RETENTION_HOURS):
         self._db_path = db_path
         self._retention_hours = retention_hours
-        self._write_lock = threading.Lock()  # 只用于写操作
-        self._last_vacuum_time = datetime.utcnow()
+        self._last_checkpoint_time = datetime.utcnow()
 
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
 
-        # 使用连接池
-        self._pool = ConnectionPool(db_path)
-        self._pool.initialize()
+        # 读写分池：WAL 下写事务由 SQLite 串行化，1 个写连接足够，
+        # 写者不再排在长读后面等连接；读池按核数放大
+        self._write_pool = ConnectionPool(db_path, pool_size=1)
+        self._read_pool = ConnectionPool(
+            db_path, pool_size=max(4, os.cpu_count() or 1), readonly=True
+        )
+        self._write_pool.initialize()
 
         self._init_db()
-        logger.info(f"SmartHistoryStore 已初始化: {db_path} (WAL 模式, 连接池)")
+        self._read_pool.initialize()
+
+        # 后台定期清理：daemon Timer 链，每 5 分钟分块删一轮过期数据
+        self._cleanup_timer: Optional[threading.Timer] = None
+        self._schedule_cleanup()
+        logger.info(f"SmartHistoryStore 已初始化: {db_path} (WAL 模式, 读写分池)")
+
+    @contextmanager
+    def _get_write_connection(self):
+        """获取写连接（单连接池，天然串行化写操作）"""
+        with self._write_pool.get_connection() as conn:
+            yield conn
 
     @contextmanager
-    def _get_connection(self):
-        """获取数据库连接（从连接池）"""
-        with self._pool.get_connection() as conn:
+    def _get_read_connection(self):
+        """获取只读连接"""
+        with self._read_pool.get_connection() as conn:
             yield conn
     
     def _init_db(self):
-        with self._get_connection() as conn:
+        with self._get_write_connection() as conn:
             cursor = conn.cursor()
-            
+
+            # 旧库迁移到增量回收模式：auto_vacuum 改值要 VACUUM 重建
+            # 才生效，一次性开销，2 小时保留窗口的库体量很小
+            if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                cursor.execute("VACUUM")
+                logger.info("数据库已迁移到 auto_vacuum=INCREMENTAL")
+
             # 帖子表 - 存储每个帖子的数据，用于去重和计算增长率
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS posts (
@@ -189,6 +670,9 @@ class SmartHistoryStore:
                     -- 趋势分数
                     trend_score REAL DEFAULT 0,
                     dimensions TEXT DEFAULT '{}',
+                    dim_h REAL DEFAULT 0, dim_v REAL DEFAULT 0,
+                    dim_d REAL DEFAULT 0, dim_f REAL DEFAULT 0,
+                    dim_m REAL DEFAULT 0, dim_r REAL DEFAULT 0,
                     lifecycle TEXT DEFAULT 'unknown',
                     priority TEXT DEFAULT 'P3',
                     
@@ -229,6 +713,9 @@ class SmartHistoryStore:
                     -- 计算的分数
                     trend_score REAL DEFAULT 0,
                     dimensions TEXT DEFAULT '{}',
+                    dim_h REAL DEFAULT 0, dim_v REAL DEFAULT 0,
+                    dim_d REAL DEFAULT 0, dim_f REAL DEFAULT 0,
+                    dim_m REAL DEFAULT 0, dim_r REAL DEFAULT 0,
                     lifecycle TEXT DEFAULT 'unknown',
                     priority TEXT DEFAULT 'P3',
                     
@@ -245,12 +732,61 @@ class SmartHistoryStore:
                 )
             """)
             
+            # 旧库补列：schema 补齐后读路径直接信任列存在，不再逐行探测
+            required_columns = {
+                "posts": (
+                    ("title", "TEXT DEFAULT ''"),
+                    ("trend_score", "REAL DEFAULT 0"),
+                    ("lifecycle", "TEXT DEFAULT 'unknown'"),
+                    ("priority", "TEXT DEFAULT 'P3'"),
+                ),
+                "tag_scores": (
+                    ("freshness_rate", "REAL DEFAULT 0.5"),
+                    ("activity_level", "TEXT DEFAULT 'unknown'"),
+                    ("new_posts_count", "INTEGER DEFAULT 0"),
+                ),
+            }
+            for table, needed in required_columns.items():
+                cols = {r[1] for r in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
+                for col, decl in needed:
+                    if col not in cols:
+                        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col} {decl}")
+
+            # 旧库迁移：补 dim_* 列并从 JSON 文本回填一次
+            for table in ("posts", "tag_scores"):
+                cols = {r[1] for r in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
+                if "dim_h" not in cols:
+                    for col in _DIM_COLUMNS:
+                        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col} REAL DEFAULT 0")
+                    cursor.execute(f"""
+                        UPDATE {table} SET
+                            dim_h = COALESCE(json_extract(dimensions, '$.H'), 0),
+                            dim_v = COALESCE(json_extract(dimensions, '$.V'), 0),
+                            dim_d = COALESCE(json_extract(dimensions, '$.D'), 0),
+                            dim_f = COALESCE(json_extract(dimensions, '$.F'), 0),
+                            dim_m = COALESCE(json_extract(dimensions, '$.M'), 0),
+                            dim_r = COALESCE(json_extract(dimensions, '$.R'), 0)
+                        WHERE dimensions IS NOT NULL AND dimensions != '{{}}'
+                    """)
+
             # 索引
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_posts_platform_tag ON posts(platform, tag)")
+            # 覆盖 (platform, tag) + ORDER BY views DESC：按序走索引，LIMIT 即停，免 filesort
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_posts_ptv ON posts(platform, tag, views DESC)")
+            # 覆盖 get_posts_ranking 的 platform 过滤 + trend_score 排序
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_posts_platform_score ON posts(platform, trend_score DESC)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_posts_last_updated ON posts(last_updated_at)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_tag_scores_platform ON tag_scores(platform)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_tag_scores_score ON tag_scores(trend_score DESC)")
+            # 清理路径的过期扫描走索引范围，不全表扫
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tag_scores_last_updated ON tag_scores(last_updated_at)")
             
+            # 启动时回源重算一次 tag 聚合基线：此后所有写路径做纯增量维护，
+            # 读路径可以无条件信任 tag_scores 里的聚合值
+            now = _iso_now()
+            cursor.execute(_SQL_TAG_AGG_REBUILD_ALL, (now, now))
+            cursor.execute(_SQL_TAG_AGG_ZERO_ORPHANS)
+
             conn.commit()
             logger.info("Smart database initialized")
 
@@ -277,95 +813,86 @@ class SmartHistoryStore:
         Returns:
             (is_new, prev_stats): 是否新帖子，以及上次的统计数据（用于计算增长率）
         """
-        now = datetime.utcnow().isoformat()
-        unique_id = f"{platform}:{post_id}"
-        
+        now = _iso_now()
+        platform_clean = _norm_platform(platform)
+        tag_clean = _norm_tag(tag)
+        # id 也用规范化 platform，和 ON CONFLICT(platform, post_id) 口径一致
+        unique_id = platform_clean + ":" + post_id
+
         views = stats.get("views", 0) or 0
         likes = stats.get("likes", 0) or 0
         comments = stats.get("comments", 0) or 0
         shares = stats.get("shares", 0) or 0
         saves = stats.get("saves", 0) or 0
         
-        with self._write_lock:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-
-                # 开始事务（WAL 模式下更高效）
-                cursor.execute("BEGIN IMMEDIATE")
-
-                try:
-                    # 检查是否已存在
-                    cursor.execute(
-                        "SELECT views, likes, comments, shares, saves, update_count FROM posts WHERE id = ?",
-                        (unique_id,)
-                    )
-                    existing = cursor.fetchone()
-
-                    if existing:
-                        # 更新现有记录，保存当前值为 prev_*
-                        prev_stats = {
-                            "views": existing["views"],
-                            "likes": existing["likes"],
-                            "comments": existing["comments"],
-                            "shares": existing["shares"],
-                            "saves": existing["saves"]
-                        }
-
-                        cursor.execute("""
-                            UPDATE posts SET
-                                views = ?, likes = ?, comments = ?, shares = ?, saves = ?,
-                                prev_views = ?, prev_likes = ?, prev_comments = ?, prev_shares = ?, prev_saves = ?,
-                                author = COALESCE(NULLIF(?, ''), author),
-                                title = COALESCE(NULLIF(?, ''), title),
-                                description = COALESCE(NULLIF(?, ''), description),
-                                content_url = COALESCE(NULLIF(?, ''), content_url),
-                                cover_url = COALESCE(NULLIF(?, ''), cover_url),
-                                trend_score = ?,
-                                dimensions = ?,
-                                lifecycle = ?,
-                                priority = ?,
-                                last_updated_at = ?,
-                                update_count = update_count + 1
-                            WHERE id = ?
-                        """, (
-                            views, likes, comments, shares, saves,
-                            prev_stats["views"], prev_stats["likes"], prev_stats["comments"],
-                            prev_stats["shares"], prev_stats["saves"],
-                            author, title, description, content_url, cover_url,
-                            trend_score, json.dumps(dimensions or {}), lifecycle, priority,
-                            now, unique_id
-                        ))
-                        cursor.execute("COMMIT")
-
-                        logger.debug(f"Updated post: {unique_id}, update_count={existing['update_count']+1}")
-                        return False, prev_stats
-                    else:
-                        # 插入新记录
-                        cursor.execute("""
-                            INSERT INTO posts
-                            (id, platform, tag, post_id, author, title, description, content_url, cover_url,
-                             views, likes, comments, shares, saves,
-                             prev_views, prev_likes, prev_comments, prev_shares, prev_saves,
-                             trend_score, dimensions, lifecycle, priority,
-                             first_seen_at, last_updated_at, post_created_at, update_count)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, 0, 0, 0, ?, ?, ?, ?, ?, ?, ?, 1)
-                        """, (
-                            unique_id, platform.lower(), tag.lower().lstrip("#"), post_id,
-                            author, title[:200] if title else "", description[:500] if description else "",
-                            content_url, cover_url,
-                            views, likes, comments, shares, saves,
-                            trend_score, json.dumps(dimensions or {}), lifecycle, priority,
-                            now, now, post_created_at
-                        ))
-                        cursor.execute("COMMIT")
-
-                        logger.debug(f"Inserted new post: {unique_id}")
-                        return True, None
-                except Exception as e:
-                    cursor.execute("ROLLBACK")
-                    logger.error(f"upsert_post 失败: {e}")
-                    raise
-    
+        with self._get_write_connection() as conn:
+            cursor = conn.cursor()
+
+            # 开始事务（WAL 模式下更高效）
+            conn.execute("BEGIN IMMEDIATE")
+
+            try:
+                # 增量公式默认帖子留在原 tag；换了 tag 就只能回源重算，
+                # 否则旧 tag 留着它的旧量、新 tag 又被多扣一份
+                cursor.execute(
+                    "SELECT tag FROM posts WHERE platform = ? AND post_id = ?",
+                    (platform_clean, post_id)
+                )
+                row = cursor.fetchone()
+                old_tag = row["tag"] if row else None
+                tag_moved = old_tag is not None and old_tag != tag_clean
+
+                if not tag_moved:
+                    # 聚合维护先行：此时帖子行还是旧值，相关子查询可取增量
+                    cursor.execute(_SQL_TAG_AGG_UPSERT_FOR_POST, (
+                        f"{platform_clean}:{tag_clean}", platform_clean, tag_clean,
+                        views, likes, comments, shares, saves,
+                        now, now, post_id
+                    ))
+
+                # 空文本传 None：更新分支的 COALESCE 保留旧值，插入分支读出时再补 ""
+                cursor.execute(_SQL_UPSERT_POST, (
+                    unique_id, platform_clean, tag_clean, post_id,
+                    author or None, title[:200] if title else None,
+                    description[:500] if description else None,
+                    content_url or None, cover_url or None,
+                    views, likes, comments, shares, saves,
+                    trend_score, *_dim_params(dimensions), lifecycle, priority,
+                    now, now, post_created_at
+                ))
+                update_count, p_views, p_likes, p_comments, p_shares, p_saves = \
+                    cursor.fetchone()
+
+                if tag_moved:
+                    # 同一事务内把新旧两个 tag 都回源重算；
+                    # 旧 tag 可能已空，重算生成不了行，再定点归零
+                    cursor.execute(_SQL_TAG_AGG_REBUILD_ONE,
+                                   (now, now, platform_clean, old_tag))
+                    cursor.execute(_SQL_TAG_AGG_REBUILD_ONE,
+                                   (now, now, platform_clean, tag_clean))
+                    cursor.execute(_SQL_TAG_AGG_ZERO_ONE,
+                                   (platform_clean, old_tag))
+
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"upsert_post 失败: {e}")
+                raise
+
+        if update_count == 1:
+            logger.debug(f"Inserted new post: {unique_id}")
+            return True, None
+
+        prev_stats = {
+            "views": p_views,
+            "likes": p_likes,
+            "comments": p_comments,
+            "shares": p_shares,
+            "saves": p_saves
+        }
+        logger.debug(f"Updated post: {unique_id}, update_count={update_count}")
+        return False, prev_stats
+
     def get_tag_aggregated_stats(
         self,
         platform: str,
@@ -390,35 +917,17 @@ class SmartHistoryStore:
                 "activity_level": str,    # 活跃度等级
             }
         """
-        tag_clean = tag.lower().lstrip("#")
-        platform_clean = platform.lower()
+        tag_clean = _norm_tag(tag)
+        platform_clean = _norm_platform(platform)
         
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.cursor()
-            
-            # 聚合当前数据
-            cursor.execute("""
-                SELECT 
-                    SUM(views) as total_views,
-                    SUM(likes) as total_likes,
-                    SUM(comments) as total_comments,
-                    SUM(shares) as total_shares,
-                    SUM(saves) as total_saves,
-                    SUM(prev_views) as prev_total_views,
-                    SUM(prev_likes) as prev_total_likes,
-                    SUM(prev_comments) as prev_total_comments,
-                    SUM(prev_shares) as prev_total_shares,
-                    SUM(prev_saves) as prev_total_saves,
-                    COUNT(*) as post_count,
-                    SUM(CASE WHEN update_count = 1 THEN 1 ELSE 0 END) as new_posts,
-                    AVG(update_count) as avg_update_count
-                FROM posts
-                WHERE platform = ? AND tag = ?
-            """, (platform_clean, tag_clean))
-            
+
+            # O(1)：_init_db 的基线重算 + 写路径增量维护保证聚合行总是权威
+            cursor.execute(_SQL_TAG_AGG_FETCH, (platform_clean, tag_clean))
             row = cursor.fetchone()
-            
-            if not row or row["post_count"] == 0:
+
+            if not row or not row["post_count"]:
                 return {
                     "current": {"views": 0, "likes": 0, "comments": 0, "shares": 0, "saves": 0},
                     "previous": {"views": 0, "likes": 0, "comments": 0, "shares": 0, "saves": 0},
@@ -428,10 +937,9 @@ class SmartHistoryStore:
                     "activity_level": "new"
                 }
             
-            new_posts = row["new_posts"] or 0
+            new_posts = row["new_posts_count"] or 0
             post_count = row["post_count"]
-            avg_update = row["avg_update_count"] or 1
-            
+
             # 计算新鲜度 (Freshness Rate)
             # 新鲜度 = 本次新增帖子数 / 本次爬取总数
             # 如果 current_batch_size 未知，用 new_posts / post_count 估算
@@ -472,8 +980,7 @@ class SmartHistoryStore:
                 "post_count": post_count,
                 "new_posts": new_posts,
                 "freshness_rate": round(freshness_rate, 3),
-                "activity_level": activity_level,
-                "avg_update_count": round(avg_update, 2)
+                "activity_level": activity_level
             }
     
     def save_tag_score(
@@ -487,8 +994,8 @@ class SmartHistoryStore:
         priority: str = "P3"
     ):
         """保存 tag 的聚合分数（包含活跃度信息）"""
-        now = datetime.utcnow().isoformat()
-        unique_id = f"{platform.lower()}:{tag.lower().lstrip('#')}"
+        now = _iso_now()
+        unique_id = _norm_platform(platform) + ":" + _norm_tag(tag)
         
         current = aggregated_stats.get("current", {})
         previous = aggregated_stats.get("previous", {})
@@ -496,50 +1003,20 @@ class SmartHistoryStore:
         activity_level = aggregated_stats.get("activity_level", "unknown")
         new_posts = aggregated_stats.get("new_posts", 0)
         
-        with self._write_lock:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-
-                cursor.execute("""
-                    INSERT INTO tag_scores
-                    (id, platform, tag,
-                     total_views, total_likes, total_comments, total_shares, total_saves, post_count,
-                     prev_total_views, prev_total_likes, prev_total_comments, prev_total_shares, prev_total_saves,
-                     trend_score, dimensions, lifecycle, priority,
-                     freshness_rate, activity_level, new_posts_count,
-                     first_seen_at, last_updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(platform, tag) DO UPDATE SET
-                        total_views = excluded.total_views,
-                        total_likes = excluded.total_likes,
-                        total_comments = excluded.total_comments,
-                        total_shares = excluded.total_shares,
-                        total_saves = excluded.total_saves,
-                        post_count = excluded.post_count,
-                        prev_total_views = excluded.prev_total_views,
-                        prev_total_likes = excluded.prev_total_likes,
-                        prev_total_comments = excluded.prev_total_comments,
-                        prev_total_shares = excluded.prev_total_shares,
-                        prev_total_saves = excluded.prev_total_saves,
-                        trend_score = excluded.trend_score,
-                        dimensions = excluded.dimensions,
-                        lifecycle = excluded.lifecycle,
-                        priority = excluded.priority,
-                        freshness_rate = excluded.freshness_rate,
-                        activity_level = excluded.activity_level,
-                        new_posts_count = excluded.new_posts_count,
-                        last_updated_at = excluded.last_updated_at
-                """, (
-                    unique_id, platform.lower(), tag.lower().lstrip("#"),
-                    current.get("views", 0), current.get("likes", 0), current.get("comments", 0),
-                    current.get("shares", 0), current.get("saves", 0), aggregated_stats.get("post_count", 0),
-                    previous.get("views", 0), previous.get("likes", 0), previous.get("comments", 0),
-                    previous.get("shares", 0), previous.get("saves", 0),
-                    trend_score, json.dumps(dimensions), lifecycle, priority,
-                    freshness_rate, activity_level, new_posts,
-                    now, now
-                ))
-                conn.commit()
+        with self._get_write_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(_SQL_UPSERT_TAG, (
+                unique_id, _norm_platform(platform), _norm_tag(tag),
+                current.get("views", 0), current.get("likes", 0), current.get("comments", 0),
+                current.get("shares", 0), current.get("saves", 0), aggregated_stats.get("post_count", 0),
+                previous.get("views", 0), previous.get("likes", 0), previous.get("comments", 0),
+                previous.get("shares", 0), previous.get("saves", 0),
+                trend_score, *_dim_params(dimensions), lifecycle, priority,
+                freshness_rate, activity_level, new_posts,
+                now, now
+            ))
+            conn.commit()
 
     def get_tag_scores(
         self,
@@ -557,63 +1034,59 @@ class SmartHistoryStore:
             min_score: 最低分数
             activity_filter: 活跃度过滤 (very_active/active/moderate/stale)
         """
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.cursor()
             
-            # 构建查询
-            conditions = ["trend_score >= ?"]
+            # 查询形状固定为 4 个预编译变体（见 _SQL_TAG_SCORES）
             params = [min_score]
-            
             if platform:
-                conditions.append("platform = ?")
-                params.append(platform.lower())
-            
+                params.append(_norm_platform(platform))
             if activity_filter:
-                conditions.append("activity_level = ?")
                 params.append(activity_filter)
-            
-            where_clause = " AND ".join(conditions)
             params.append(limit)
+
+            cursor.execute(
+                _SQL_TAG_SCORES[(platform is not None, activity_filter is not None)],
+                params
+            )
             
-            cursor.execute(f"""
-                SELECT * FROM tag_scores 
-                WHERE {where_clause}
-                ORDER BY trend_score DESC
-                LIMIT ?
-            """, params)
-            
-            results = []
-            for row in cursor.fetchall():
-                # 安全获取可能不存在的列
-                freshness = row["freshness_rate"] if "freshness_rate" in row.keys() else 0.5
-                activity = row["activity_level"] if "activity_level" in row.keys() else "unknown"
-                new_posts = row["new_posts_count"] if "new_posts_count" in row.keys() else 0
-                
-                results.append({
-                    "platform": row["platform"],
-                    "tag": row["tag"],
-                    "trend_score": row["trend_score"],
-                    "dimensions": json.loads(row["dimensions"]) if row["dimensions"] else {},
-                    "lifecycle": row["lifecycle"],
-                    "priority": row["priority"],
-                    "post_count": row["post_count"],
-                    "stats": {
-                        "views": row["total_views"],
-                        "likes": row["total_likes"],
-                        "comments": row["total_comments"],
-                        "shares": row["total_shares"],
-                        "saves": row["total_saves"]
-                    },
-                    # 新增：活跃度信息
-                    "activity": {
-                        "freshness_rate": freshness,
-                        "activity_level": activity,
-                        "new_posts": new_posts,
-                    },
-                    "last_updated_at": row["last_updated_at"]
-                })
-            
-            return results
+            # 位置元组 + 解包：跳过 sqlite3.Row 的名字哈希查找
+            cursor.row_factory = None
+            return [_tag_score_row_to_dict(row) for row in cursor.fetchall()]
+
+    def iter_tag_scores(
+        self,
+        platform: Optional[str] = None,
+        limit: int = 50,
+        min_score: float = 0,
+        activity_filter: Optional[str] = None
+    ):
+        """
+        get_tag_scores 的流式版本：按 1000 行一批 fetchmany 后逐行 yield，
+        不把整个结果集物化成 list。注意生成器存活期间会占用一个读连接，
+        消费方应尽快迭代完或及时丢弃。
+        """
+        with self._get_read_connection() as conn:
+            cursor = conn.cursor()
+
+            params = [min_score]
+            if platform:
+                params.append(_norm_platform(platform))
+            if activity_filter:
+                params.append(activity_filter)
+            params.append(limit)
+
+            cursor.execute(
+                _SQL_TAG_SCORES[(platform is not None, activity_filter is not None)],
+                params
+            )
+            cursor.row_factory = None
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for row in rows:
+                    yield _tag_score_row_to_dict(row)
     
     def get_posts_by_tag(
         self,
@@ -622,44 +1095,54 @@ class SmartHistoryStore:
         limit: int = 30
     ) -> List[Dict[str, Any]]:
         """获取某个 tag 下的帖子列表"""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.cursor()
             
+            cursor.row_factory = None
             cursor.execute("""
-                SELECT * FROM posts
+                SELECT post_id, platform, tag, author, title, description,
+                       content_url, cover_url,
+                       views, likes, comments, shares, saves,
+                       prev_views, prev_likes, prev_comments, prev_shares, prev_saves,
+                       update_count, first_seen_at, last_updated_at
+                FROM posts
                 WHERE platform = ? AND tag = ?
                 ORDER BY views DESC
                 LIMIT ?
-            """, (platform.lower(), tag.lower().lstrip("#"), limit))
+            """, (_norm_platform(platform), _norm_tag(tag), limit))
             
             results = []
-            for row in cursor.fetchall():
+            for (post_id, row_platform, row_tag, author, title, description,
+                 content_url, cover_url,
+                 views, likes, comments, shares, saves,
+                 prev_views, prev_likes, prev_comments, prev_shares, prev_saves,
+                 update_count, first_seen_at, last_updated_at) in cursor.fetchall():
                 results.append({
-                    "post_id": row["post_id"],
-                    "platform": row["platform"],
-                    "tag": row["tag"],
-                    "author": row["author"],
-                    "title": row["title"] if "title" in row.keys() else "",
-                    "description": row["description"],
-                    "content_url": row["content_url"],
-                    "cover_url": row["cover_url"],
+                    "post_id": post_id,
+                    "platform": row_platform,
+                    "tag": row_tag,
+                    "author": author or "",
+                    "title": title or "",
+                    "description": description or "",
+                    "content_url": content_url or "",
+                    "cover_url": cover_url or "",
                     "stats": {
-                        "views": row["views"],
-                        "likes": row["likes"],
-                        "comments": row["comments"],
-                        "shares": row["shares"],
-                        "saves": row["saves"]
+                        "views": views,
+                        "likes": likes,
+                        "comments": comments,
+                        "shares": shares,
+                        "saves": saves
                     },
                     "prev_stats": {
-                        "views": row["prev_views"],
-                        "likes": row["prev_likes"],
-                        "comments": row["prev_comments"],
-                        "shares": row["prev_shares"],
-                        "saves": row["prev_saves"]
+                        "views": prev_views,
+                        "likes": prev_likes,
+                        "comments": prev_comments,
+                        "shares": prev_shares,
+                        "saves": prev_saves
                     },
-                    "update_count": row["update_count"],
-                    "first_seen_at": row["first_seen_at"],
-                    "last_updated_at": row["last_updated_at"]
+                    "update_count": update_count,
+                    "first_seen_at": first_seen_at,
+                    "last_updated_at": last_updated_at
                 })
             
             return results
@@ -678,59 +1161,43 @@ class SmartHistoryStore:
             limit: 返回数量
             min_score: 最低分数
         """
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.cursor()
             
+            cursor.row_factory = None
             if platform:
-                cursor.execute("""
-                    SELECT * FROM posts 
-                    WHERE platform = ? AND trend_score >= ?
-                    ORDER BY trend_score DESC
-                    LIMIT ?
-                """, (platform.lower(), min_score, limit))
+                cursor.execute(_SQL_RANKING_BY_PLATFORM,
+                               (_norm_platform(platform), min_score, limit))
             else:
-                cursor.execute("""
-                    SELECT * FROM posts 
-                    WHERE trend_score >= ?
-                    ORDER BY trend_score DESC
-                    LIMIT ?
-                """, (min_score, limit))
-            
-            results = []
-            for row in cursor.fetchall():
-                # 安全获取可能不存在的列
-                dims = {}
-                try:
-                    dims = json.loads(row["dimensions"]) if row["dimensions"] else {}
-                except:
-                    pass
-                
-                results.append({
-                    "id": row["id"],
-                    "platform": row["platform"],
-                    "tag": row["tag"],
-                    "post_id": row["post_id"],
-                    "author": row["author"],
-                    "title": row["title"] if "title" in row.keys() else "",
-                    "description": row["description"],
-                    "content_url": row["content_url"],
-                    "cover_url": row["cover_url"],
-                    "trend_score": row["trend_score"] if "trend_score" in row.keys() else 0,
-                    "dimensions": dims,
-                    "lifecycle": row["lifecycle"] if "lifecycle" in row.keys() else "unknown",
-                    "priority": row["priority"] if "priority" in row.keys() else "P3",
-                    "stats": {
-                        "views": row["views"],
-                        "likes": row["likes"],
-                        "comments": row["comments"],
-                        "shares": row["shares"],
-                        "saves": row["saves"]
-                    },
-                    "update_count": row["update_count"],
-                    "last_updated_at": row["last_updated_at"]
-                })
-            
-            return results
+                cursor.execute(_SQL_RANKING_ALL, (min_score, limit))
+
+            return [_ranking_row_to_dict(row) for row in cursor.fetchall()]
+
+    def iter_posts_ranking(
+        self,
+        platform: Optional[str] = None,
+        limit: int = 50,
+        min_score: float = 0
+    ):
+        """
+        get_posts_ranking 的流式版本：fetchmany 分批逐行 yield，
+        响应可以边查边发，峰值内存只有一批。生成器存活期间占用一个读连接。
+        """
+        with self._get_read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            if platform:
+                cursor.execute(_SQL_RANKING_BY_PLATFORM,
+                               (_norm_platform(platform), min_score, limit))
+            else:
+                cursor.execute(_SQL_RANKING_ALL, (min_score, limit))
+
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for row in rows:
+                    yield _ranking_row_to_dict(row)
 
     def get_top_post_for_tag(
         self,
@@ -738,7 +1205,7 @@ class SmartHistoryStore:
         tag: str
     ) -> Optional[Dict[str, Any]]:
         """获取某个 tag 下最热门的帖子（用于展示代表信息）"""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -747,68 +1214,103 @@ class SmartHistoryStore:
                 WHERE platform = ? AND tag = ?
                 ORDER BY views DESC
                 LIMIT 1
-            """, (platform.lower(), tag.lower().lstrip("#")))
+            """, (_norm_platform(platform), _norm_tag(tag)))
             
             row = cursor.fetchone()
             if row:
                 return {
-                    "author": row["author"],
-                    "title": row["title"] if "title" in row.keys() else "",
-                    "description": row["description"],
-                    "content_url": row["content_url"],
-                    "cover_url": row["cover_url"],
+                    "author": row["author"] or "",
+                    "title": row["title"] or "",
+                    "description": row["description"] or "",
+                    "content_url": row["content_url"] or "",
+                    "cover_url": row["cover_url"] or "",
                     "views": row["views"]
                 }
             return None
     
+    _CLEANUP_INTERVAL = 300.0
+
+    def _schedule_cleanup(self):
+        self._cleanup_timer = threading.Timer(
+            self._CLEANUP_INTERVAL, self._cleanup_loop
+        )
+        self._cleanup_timer.daemon = True
+        self._cleanup_timer.start()
+
+    def _cleanup_loop(self):
+        try:
+            self.cleanup_expired()
+        except Exception as e:
+            logger.error(f"后台清理失败: {e}")
+        finally:
+            self._schedule_cleanup()
+
     def cleanup_expired(self):
-        """清理过期数据"""
+        """清理过期数据（分块删除，块间归还写连接，不长时间压住写路径）"""
         cutoff = datetime.utcnow() - timedelta(hours=self._retention_hours)
         cutoff_str = cutoff.isoformat()
-        
-        with self._get_connection() as conn:
+
+        posts_count = 0
+        while True:
+            with self._get_write_connection() as conn:
+                cursor = conn.execute(_SQL_DELETE_EXPIRED_CHUNK, (cutoff_str,))
+            deleted = cursor.rowcount
+            posts_count += deleted
+            if deleted < _CLEANUP_CHUNK_SIZE:
+                break
+            time.sleep(0.01)
+
+        with self._get_write_connection() as conn:
             cursor = conn.cursor()
-            
-            # 清理过期帖子
-            cursor.execute("SELECT COUNT(*) FROM posts WHERE last_updated_at < ?", (cutoff_str,))
-            posts_count = cursor.fetchone()[0]
-            
+
             if posts_count > 0:
-                cursor.execute("DELETE FROM posts WHERE last_updated_at < ?", (cutoff_str,))
                 logger.info(f"Cleaned {posts_count} expired posts")
-            
-            # 清理过期 tag 分数
-            cursor.execute("SELECT COUNT(*) FROM tag_scores WHERE last_updated_at < ?", (cutoff_str,))
-            tags_count = cursor.fetchone()[0]
-            
+
+                # 删帖后把 tag 聚合拉回和 posts 一致
+                now = _iso_now()
+                cursor.execute(_SQL_TAG_AGG_REBUILD_ALL, (now, now))
+                cursor.execute(_SQL_TAG_AGG_ZERO_ORPHANS)
+
+            # 清理过期 tag 分数：rowcount 拿删除数，不做先行 COUNT 扫描
+            cursor.execute("DELETE FROM tag_scores WHERE last_updated_at < ?", (cutoff_str,))
+            tags_count = cursor.rowcount
+
             if tags_count > 0:
-                cursor.execute("DELETE FROM tag_scores WHERE last_updated_at < ?", (cutoff_str,))
                 logger.info(f"Cleaned {tags_count} expired tag scores")
-            
+
             conn.commit()
-            
-            # VACUUM
-            if posts_count + tags_count >= 100:
-                conn.execute("VACUUM")
-                logger.info("Database vacuumed")
+
+            # 有限步回收 freelist：每轮最多还 _INCR_VACUUM_PAGES 页，
+            # 代价 O(N 页) 而不是全量 VACUUM 的 O(库大小)
+            if posts_count + tags_count > 0:
+                freelist = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+                if freelist > 0:
+                    cursor.execute(f"PRAGMA incremental_vacuum({_INCR_VACUUM_PAGES})")
+
+            # WAL checkpoint 代替 VACUUM：回收 WAL 空间不用重写主库文件，
+            # 也不需要 VACUUM 那样的排他锁；最多 10 分钟做一次
+            now_dt = datetime.utcnow()
+            if (posts_count + tags_count > 0
+                    and (now_dt - self._last_checkpoint_time).total_seconds() >= 600):
+                cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._last_checkpoint_time = now_dt
+                logger.info("WAL checkpointed (TRUNCATE)")
     
     def get_stats(self) -> Dict[str, Any]:
         """获取存储统计"""
-        with self._get_connection() as conn:
+        with self._get_read_connection() as conn:
             cursor = conn.cursor()
-            
-            cursor.execute("SELECT COUNT(*) FROM posts")
-            total_posts = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM tag_scores")
-            total_tags = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(DISTINCT platform) FROM posts")
-            platforms = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT AVG(trend_score) FROM tag_scores")
-            avg_score = cursor.fetchone()[0] or 0
-            
+
+            # 四个标量合成一条语句，一次往返拿齐
+            cursor.execute("""
+                SELECT (SELECT COUNT(*) FROM posts),
+                       (SELECT COUNT(*) FROM tag_scores),
+                       (SELECT COUNT(DISTINCT platform) FROM posts),
+                       (SELECT AVG(trend_score) FROM tag_scores)
+            """)
+            total_posts, total_tags, platforms, avg_score = cursor.fetchone()
+            avg_score = avg_score or 0
+
             return {
                 "total_posts": total_posts,
                 "total_tags": total_tags,
@@ -818,17 +1320,20 @@ class SmartHistoryStore:
     
     def clear_all(self):
         """清空所有数据（谨慎使用）"""
-        with self._write_lock:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM posts")
-                cursor.execute("DELETE FROM tag_scores")
-                conn.execute("VACUUM")
-                logger.warning("All smart history data cleared")
+        with self._get_write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM posts")
+            cursor.execute("DELETE FROM tag_scores")
+            conn.execute("VACUUM")
+            logger.warning("All smart history data cleared")
 
     def close(self):
         """关闭连接池（程序退出时调用）"""
-        self._pool.close_all()
+        if self._cleanup_timer is not None:
+            self._cleanup_timer.cancel()
+            self._cleanup_timer = None
+        self._write_pool.close_all()
+        self._read_pool.close_all()
 
     def batch_upsert_posts(
         self,
@@ -849,82 +1354,83 @@ class SmartHistoryStore:
         if not posts_data:
             return 0, 0
 
-        now = datetime.utcnow().isoformat()
+        now = _iso_now()
+
+        # Python 侧的准备工作全部放在事务临界区外：
+        # 规整/截断/绑定元组先做完，探查走只读连接，
+        # 写连接拿到后只剩 executemany + 聚合重算
+        # 探测键用规范化 platform，和 ON CONFLICT(platform, post_id) 口径
+        # 一致——否则同一帖换个大小写就会被误计成新增
+        keys = [
+            (_norm_platform(data.get("platform", "unknown")),
+             data.get("post_id", ""))
+            for data in posts_data
+        ]
+        ids = [f"{p}:{pid}" for p, pid in keys]
+        rows = [
+            _batch_row_params(data, unique_id, now)
+            for data, unique_id in zip(posts_data, ids)
+        ]
+        touched_tags = {(row[1], row[2]) for row in rows}
+
+        # 一次 SELECT ... IN 统计新增/更新数量，顺带取出已有帖子的 tag——
+        # 写入本身交给 ON CONFLICT，单次 B-tree 查找内决定插入还是更新。
+        # 直接按冲突目标的 (platform, post_id) 探测，历史行的 id 拼法
+        # 不影响匹配；每对键占 2 个绑定变量，按 499 对分段，
+        # 不超过保守编译 SQLite 的 999 变量上限
+        existing_tags: Dict[Tuple[str, str], str] = {}
+        with self._get_read_connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(keys), 499):
+                chunk = keys[start:start + 499]
+                placeholders = ",".join(["(?, ?)"] * len(chunk))
+                flat = [v for pair in chunk for v in pair]
+                cursor.execute(
+                    f"SELECT platform, post_id, tag FROM posts "
+                    f"WHERE (platform, post_id) IN (VALUES {placeholders})",
+                    flat
+                )
+                for row in cursor.fetchall():
+                    existing_tags[(row["platform"], row["post_id"])] = row["tag"]
+
+        # upsert 会把帖子挪到新 tag：旧 tag 的聚合同样要回源重算
+        vacated_tags = set()
+        for key, row in zip(keys, rows):
+            old_tag = existing_tags.get(key)
+            if old_tag is not None and old_tag != row[2]:
+                vacated_tags.add((row[1], old_tag))
+        touched_tags |= vacated_tags
+
+        existing_keys = set(existing_tags)
         new_count = 0
-        updated_count = 0
-
-        with self._write_lock:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute("BEGIN IMMEDIATE")
-
-                try:
-                    for data in posts_data:
-                        platform = data.get("platform", "unknown")
-                        post_id = data.get("post_id", "")
-                        unique_id = f"{platform}:{post_id}"
-
-                        stats = data.get("stats", {})
-                        views = stats.get("views", 0) or 0
-                        likes = stats.get("likes", 0) or 0
-                        comments = stats.get("comments", 0) or 0
-                        shares = stats.get("shares", 0) or 0
-                        saves = stats.get("saves", 0) or 0
-
-                        # 检查是否已存在
-                        cursor.execute(
-                            "SELECT id FROM posts WHERE id = ?",
-                            (unique_id,)
-                        )
-                        existing = cursor.fetchone()
-
-                        tag = data.get("tag", "").lower().lstrip("#")
-                        author = data.get("author", "")
-                        title = data.get("title", "")[:200] if data.get("title") else ""
-                        description = data.get("description", "")[:500] if data.get("description") else ""
-                        content_url = data.get("content_url", "")
-                        cover_url = data.get("cover_url", "")
-                        trend_score = data.get("trend_score", 0)
-                        dimensions = json.dumps(data.get("dimensions", {}))
-                        lifecycle = data.get("lifecycle", "unknown")
-                        priority = data.get("priority", "P3")
-                        post_created_at = data.get("post_created_at", "")
-
-                        if existing:
-                            # 更新
-                            cursor.execute("""
-                                UPDATE posts SET
-                                    prev_views = views, prev_likes = likes,
-                                    prev_comments = comments, prev_shares = shares, prev_saves = saves,
-                                    views = ?, likes = ?, comments = ?, shares = ?, saves = ?,
-                                    trend_score = ?, dimensions = ?, lifecycle = ?, priority = ?,
-                                    last_updated_at = ?, update_count = update_count + 1
-                                WHERE id = ?
-                            """, (views, likes, comments, shares, saves,
-                                  trend_score, dimensions, lifecycle, priority, now, unique_id))
-                            updated_count += 1
-                        else:
-                            # 插入
-                            cursor.execute("""
-                                INSERT INTO posts
-                                (id, platform, tag, post_id, author, title, description,
-                                 content_url, cover_url, views, likes, comments, shares, saves,
-                                 prev_views, prev_likes, prev_comments, prev_shares, prev_saves,
-                                 trend_score, dimensions, lifecycle, priority,
-                                 first_seen_at, last_updated_at, post_created_at, update_count)
-                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, 0, 0, 0, ?, ?, ?, ?, ?, ?, ?, 1)
-                            """, (unique_id, platform.lower(), tag, post_id, author, title, description,
-                                  content_url, cover_url, views, likes, comments, shares, saves,
-                                  trend_score, dimensions, lifecycle, priority, now, now, post_created_at))
-                            new_count += 1
-
-                    cursor.execute("COMMIT")
-                    logger.info(f"批量写入完成: {new_count} 新增, {updated_count} 更新")
-
-                except Exception as e:
-                    cursor.execute("ROLLBACK")
-                    logger.error(f"批量写入失败: {e}")
-                    raise
+        for key in keys:
+            if key not in existing_keys:
+                new_count += 1
+                # 同批次内重复的 post 算一次新增，其余算更新
+                existing_keys.add(key)
+
+        with self._get_write_connection() as conn:
+            cursor = conn.cursor()
+
+            # 单事务 + executemany：N 行只付一次 fsync 和一次写锁
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.executemany(_SQL_BATCH_UPSERT_POST, rows)
+                # 批量路径不逐行记增量，写完后按涉及的 tag 回源重算聚合
+                for tag_platform, tag_name in touched_tags:
+                    cursor.execute(_SQL_TAG_AGG_REBUILD_ONE,
+                                   (now, now, tag_platform, tag_name))
+                # 被搬空的旧 tag 重算补不到行，定点归零
+                for tag_platform, tag_name in vacated_tags:
+                    cursor.execute(_SQL_TAG_AGG_ZERO_ONE,
+                                   (tag_platform, tag_name))
+                conn.commit()
+                updated_count = len(ids) - new_count
+                logger.info(f"批量写入完成: {new_count} 新增, {updated_count} 更新")
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"批量写入失败: {e}")
+                raise
 
         return new_count, updated_count
 
@@ -13,14 +13,29 @@ Architecture:
 import asyncio
 import json
 import logging
+import time
 from datetime import datetime
-from typing import Dict, Set, Optional, AsyncGenerator
+from typing import Dict, Set, Optional, Tuple, AsyncGenerator
 from dataclasses import dataclass, field
-import threading
-from queue import Queue, Empty
+from collections import defaultdict, deque
 
 from confluent_kafka import Consumer, KafkaError
 
+try:
+    import orjson
+
+    def _json_dumps_bytes(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def _json_loads(data):
+        return orjson.loads(data)
+except ImportError:  # pragma: no cover
+    def _json_dumps_bytes(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    def _json_loads(data):
+        return json.loads(data)
+
 from app.config import get_settings
 from app.services.kafka_client import kafka_client
 from app.services.adaptive_trend_scorer import adaptive_trend_scorer
@@ -29,6 +44,18 @@ from app.services.smart_history_store import smart_history_store
 logger = logging.getLogger(__name__)
 
 
+def _iso_now() -> str:
+    """UTC ISO 时间戳，格式同 datetime.utcnow().isoformat()。
+
+    直接从 time.time() 格式化，省掉每次构造 datetime 对象的开销。
+    """
+    t = time.time()
+    st = time.gmtime(t)
+    return (f"{st.tm_year:04d}-{st.tm_mon:02d}-{st.tm_mday:02d}"
+            f"T{st.tm_hour:02d}:{st.tm_min:02d}:{st.tm_sec:02d}"
+            f".{int(t % 1 * 1e6):06d}")
+
+
 @dataclass
 class SSEClient:
     """Represents a connected SSE client."""
@@ -51,13 +78,23 @@ class StreamManager:
 
     def __init__(self):
         self._settings = get_settings()
-        self._clients: Dict[str, Queue] = {}
+        # client_id -> (环形缓冲, 有新帧事件)。满了丢最旧的一帧：
+        # 实时流里慢客户端宁可缺历史，也要拿到最新分数
+        self._clients: Dict[str, Tuple[deque, asyncio.Event]] = {}
         self._client_info: Dict[str, SSEClient] = {}
+        # topic -> 订阅该 topic 的 client_id 集合，broadcast 只走匹配子集
+        self._topic_index: Dict[str, Set[str]] = defaultdict(set)
+        # client_id -> 自上次心跳以来因队列满而丢弃的帧数，心跳时汇总打印
+        self._drops: Dict[str, int] = defaultdict(int)
+        # client_id -> 最近一次发帧的单调时钟；数据流本身就能保活，
+        # 心跳只发给超过一个周期没收到任何帧的客户端
+        self._last_sent: Dict[str, float] = {}
         self._running = False
+        # stop() 置位后两个后台循环立即退出，而不是等到下一次超时
+        self._stop_event: Optional[asyncio.Event] = None
         self._consumer_task: Optional[asyncio.Task] = None
         self._heartbeat_task: Optional[asyncio.Task] = None
         self._kafka_consumer: Optional[Consumer] = None
-        self._lock = threading.Lock()
 
     @property
     def client_count(self) -> int:
@@ -91,6 +128,7 @@ class StreamManager:
             return
 
         self._running = True
+        self._stop_event = asyncio.Event()
 
         # Start background tasks
         self._consumer_task = asyncio.create_task(self._kafka_consumer_loop())
@@ -101,6 +139,8 @@ class StreamManager:
     async def stop(self):
         """Stop the stream manager and cleanup."""
         self._running = False
+        if self._stop_event:
+            self._stop_event.set()
 
         # Cancel tasks
         if self._consumer_task:
@@ -125,10 +165,13 @@ class StreamManager:
         # Clear clients
         self._clients.clear()
         self._client_info.clear()
+        self._topic_index.clear()
+        self._drops.clear()
+        self._last_sent.clear()
 
         logger.info("Stream manager stopped")
 
-    def register_client(self, client_id: str, topics: Optional[Set[str]] = None) -> Queue:
+    def register_client(self, client_id: str, topics: Optional[Set[str]] = None) -> Tuple[deque, asyncio.Event]:
         """
         Register a new SSE client.
 
@@ -137,30 +180,41 @@ class StreamManager:
             topics: Set of topics to subscribe to
 
         Returns:
-            Queue: Message queue for this client
+            (deque, asyncio.Event): ring buffer of pending frames and the
+            event signalling new data for this client
         """
-        with self._lock:
-            if client_id in self._clients:
-                logger.warning(f"Client {client_id} already registered, replacing")
-
-            # 增加队列容量，避免数据量大时消息丢失
-            queue = Queue(maxsize=500)  # Buffer up to 500 messages (原来是100)
-            self._clients[client_id] = queue
-            self._client_info[client_id] = SSEClient(
-                client_id=client_id,
-                topics=topics or {"vks-scores", "market-stream"}
-            )
-
-            logger.info(f"Client {client_id} registered. Total clients: {len(self._clients)}")
-            return queue
+        if client_id in self._clients:
+            logger.warning(f"Client {client_id} already registered, replacing")
+            # 先把旧注册从订阅索引里摘掉，否则换了更窄的 topic 集合后
+            # 旧 topic 还会继续往这个 id 投帧，且从此无人清理
+            old_info = self._client_info.pop(client_id)
+            for t in old_info.topics:
+                self._topic_index[t].discard(client_id)
+
+        # 缓冲 500 帧，溢出时 deque 自动挤掉最旧的
+        entry = (deque(maxlen=500), asyncio.Event())
+        client_topics = topics or {"vks-scores", "market-stream"}
+        self._clients[client_id] = entry
+        self._client_info[client_id] = SSEClient(
+            client_id=client_id,
+            topics=client_topics
+        )
+        for t in client_topics:
+            self._topic_index[t].add(client_id)
+        self._last_sent[client_id] = time.monotonic()
+
+        logger.info(f"Client {client_id} registered. Total clients: {len(self._clients)}")
+        return entry
 
     def unregister_client(self, client_id: str):
         """Remove a client from the stream manager."""
-        with self._lock:
-            if client_id in self._clients:
-                del self._clients[client_id]
-                del self._client_info[client_id]
-                logger.info(f"Client {client_id} unregistered. Total clients: {len(self._clients)}")
+        if client_id in self._clients:
+            del self._clients[client_id]
+            info = self._client_info.pop(client_id)
+            for t in info.topics:
+                self._topic_index[t].discard(client_id)
+            self._last_sent.pop(client_id, None)
+            logger.info(f"Client {client_id} unregistered. Total clients: {len(self._clients)}")
 
     def broadcast(self, event_type: str, data: dict, topic: Optional[str] = None):
         """
@@ -170,28 +224,49 @@ class StreamManager:
             event_type: SSE event type
             data: Message data
             topic: Optional topic filter (only send to clients subscribed to this topic)
-        """
-        message = {
-            "event": event_type,
-            "data": data,
-            "timestamp": datetime.utcnow().isoformat()
-        }
 
-        with self._lock:
-            for client_id, queue in self._clients.items():
-                # Check topic filter
-                if topic:
-                    client_info = self._client_info.get(client_id)
-                    if client_info and topic not in client_info.topics:
-                        continue
-
-                try:
-                    queue.put_nowait(message)
-                except Exception:
-                    # Queue full, skip this message for this client
-                    logger.warning(f"Queue full for client {client_id}, dropping message")
+        Must be called on the event loop thread (all current callers are
+        coroutines); cross-thread callers should go through
+        loop.call_soon_threadsafe.
+        """
+        # 没人听就直接返回，连帧都不用格式化
+        clients = self._clients
+        if topic:
+            subscriber_ids = self._topic_index.get(topic)
+            if not subscriber_ids:
+                return
+        elif not clients:
+            return
 
-    def _parse_vks_scores_message(self, msg) -> dict:
+        # SSE 帧在这里就序列化好：K 个客户端共享同一份字符串，
+        # JSON 编码只做一次而不是每个客户端一次
+        frame = format_sse_event(event_type, data)
+
+        # 快照一份再迭代：注册/注销同样跑在事件循环线程上，
+        # 协作式调度下快照期间不会被打断，无需任何锁。
+        # 带 topic 的消息直接查订阅索引，不逐个客户端过滤。
+        # self.xxx 提前绑成局部变量，循环里省掉逐次属性查找
+        drops = self._drops
+        last_sent = self._last_sent
+        now = time.monotonic()
+        if topic:
+            targets = [
+                (cid, clients[cid])
+                for cid in tuple(subscriber_ids)
+                if cid in clients
+            ]
+        else:
+            targets = list(clients.items())
+
+        for client_id, (buf, event) in targets:
+            # 满了 append 会挤掉最旧一帧；只记个数，心跳时汇总打印
+            if len(buf) == buf.maxlen:
+                drops[client_id] += 1
+            buf.append(frame)
+            event.set()
+            last_sent[client_id] = now
+
+    def _parse_vks_scores_message(self, msg, ts: Optional[str] = None) -> dict:
         """
         Parse a message from vks-scores topic.
 
@@ -199,29 +274,31 @@ class StreamManager:
         - key: hashtag as UTF-8 bytes (e.g., b"#NFT")
         - val: VKS score as UTF-8 bytes (e.g., b"58.55")
 
+        Args:
+            msg: Kafka message
+            ts: Optional ISO timestamp shared with the enclosing poll tick
+
         Returns:
             dict: Structured VKS data with hashtag and score
         """
         try:
-            # Decode key (hashtag)
+            # Decode key (hashtag) — 保持 utf-8，hashtag 可能含中文
             key_bytes = msg.key()
             hashtag = key_bytes.decode("utf-8") if key_bytes else "unknown"
 
-            # Decode value (VKS score)
+            # Value is an ASCII float literal; float() accepts bytes
+            # directly, so skip the intermediate str on the happy path
             val_bytes = msg.value()
-            vks_score_str = val_bytes.decode("utf-8") if val_bytes else "0"
-
-            # Try to parse as float
             try:
-                vks_score = float(vks_score_str)
+                vks_score = float(val_bytes) if val_bytes else 0.0
             except ValueError:
                 vks_score = 0.0
-                logger.warning(f"Could not parse VKS score: {vks_score_str}")
+                logger.warning(f"Could not parse VKS score: {val_bytes!r}")
 
             return {
                 "hashtag": hashtag,
                 "vks_score": vks_score,
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": ts or _iso_now(),
                 "source": "flink_sql"
             }
         except Exception as e:
@@ -232,7 +309,7 @@ class StreamManager:
                 "error": str(e)
             }
 
-    def _calculate_vks_from_market_data(self, data: dict) -> dict:
+    def _calculate_vks_from_market_data(self, data: dict, ts: Optional[str] = None) -> dict:
         """
         Calculate Trend Score from market-stream raw data using adaptive_trend_scorer.
         
@@ -364,11 +441,13 @@ class StreamManager:
                 keyword=hashtag.lstrip("#")
             )
             
-            logger.info(f"📊 Adaptive Trend Score - platform: {platform}, keyword: {hashtag}, "
-                        f"trend_score: {score_result.get('trend_score')}, "
-                        f"H={score_result.get('H')}, V={score_result.get('V')}, "
-                        f"D={score_result.get('D')}, F={score_result.get('F')}, "
-                        f"M={score_result.get('M')}, R={score_result.get('R')}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📊 Adaptive Trend Score - platform: %s, keyword: %s, "
+                             "trend_score: %s, H=%s, V=%s, D=%s, F=%s, M=%s, R=%s",
+                             platform, hashtag, score_result.get('trend_score'),
+                             score_result.get('H'), score_result.get('V'),
+                             score_result.get('D'), score_result.get('F'),
+                             score_result.get('M'), score_result.get('R'))
             
             # 构建结果
             result = {
@@ -382,7 +461,7 @@ class StreamManager:
                 "description": description[:500] if description else "",
                 "content_url": content_url,
                 "cover_url": cover_url,
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": ts or _iso_now(),
                 "source": "adaptive_trend_scorer",
                 # 6 维度分数
                 "dimensions": {
@@ -490,12 +569,13 @@ class StreamManager:
                     "new_posts": aggregated.get("new_posts", 0),
                 }
                 
-                status = "NEW" if is_new else "UPDATED"
-                freshness = aggregated.get("freshness_rate", 0)
-                activity = aggregated.get("activity_level", "?")
-                logger.info(f"📦 [{status}] {platform}/{hashtag}: posts={aggregated['post_count']}, "
-                           f"score={aggregated_score['trend_score']}, V={aggregated_score['V']:.2f}, "
-                           f"D={aggregated_score['D']:.2f}, freshness={freshness:.0%} ({activity})")
+                logger.info("📦 [%s] %s/%s: posts=%s, score=%s, V=%.2f, D=%.2f, "
+                            "freshness=%.0f%% (%s)",
+                            "NEW" if is_new else "UPDATED", platform, hashtag,
+                            aggregated['post_count'], aggregated_score['trend_score'],
+                            aggregated_score['V'], aggregated_score['D'],
+                            aggregated.get("freshness_rate", 0) * 100,
+                            aggregated.get("activity_level", "?"))
                 
             except Exception as e:
                 logger.warning(f"Failed to smart store: {e}", exc_info=True)
@@ -518,7 +598,6 @@ class StreamManager:
         
         try:
             # Initialize consumer with unique group id to get all messages
-            import time
             unique_group_id = f"adalpha-sse-stream-{int(time.time())}"
             
             # 在线程池中初始化 consumer，避免阻塞事件循环
@@ -534,115 +613,198 @@ class StreamManager:
             logger.info(f"Kafka consumer started for SSE streaming (group: {unique_group_id})")
             logger.info("Subscribed to topics: vks-scores, market-stream")
 
+            # 在线程池中执行阻塞的批量 consume：
+            # 一次线程切换带回至多 50 条消息，而不是每条各付一次
+            def _consume_batch():
+                return self._kafka_consumer.consume(num_messages=50, timeout=1.0)
+
+            # 流水线：处理当前批的同时，下一次 fetch 已经在执行器线程里跑，
+            # 消费节奏不被广播 / 入库耗时卡住
+            pending = loop.run_in_executor(None, _consume_batch)
+
             while self._running:
                 try:
-                    # 在线程池中执行阻塞的 poll 操作
-                    msg = await loop.run_in_executor(
-                        None,
-                        lambda: self._kafka_consumer.poll(timeout=1.0)
-                    )
+                    msgs = await pending
+                    pending = loop.run_in_executor(None, _consume_batch)
 
-                    if msg is None:
+                    if not msgs:
                         # 没有消息，继续循环
                         continue
 
-                    if msg.error():
-                        if msg.error().code() == KafkaError._PARTITION_EOF:
-                            logger.debug(f"Reached end of partition for {msg.topic()}")
-                            continue
-                        logger.error(f"Kafka error: {msg.error()}")
-                        continue
-
-                    # 收到消息，打印日志
-                    logger.info(f"📨 Received message from topic: {msg.topic()}, partition: {msg.partition()}, offset: {msg.offset()}")
-
-                    # Parse message
-                    topic = msg.topic()
-
-                    # Handle vks-scores topic specially (Flink SQL outputs raw bytes)
-                    if topic == "vks-scores":
-                        data = self._parse_vks_scores_message(msg)
-                        event_type = "vks_update"
-                        # Broadcast to clients
-                        logger.info(f"📤 Broadcasting {event_type} to {self.client_count} clients: {data}")
-                        self.broadcast(event_type, data, topic)
-                        
-                    elif topic == "market-stream":
-                        # market-stream has JSON format from crawler
-                        value = msg.value().decode("utf-8")
-                        try:
-                            raw_data = json.loads(value)
-                        except json.JSONDecodeError:
-                            raw_data = {"raw": value}
-
-                        # 🔧 修复：检查数据是否被 Kafka 中间件包装
-                        # 如果数据被包装，keys 会是 ['event_id', 'event_type', 'data', 'source', 'ingested_at']
-                        # 真正的社交数据藏在 'data' 字段里
-                        if 'data' in raw_data and isinstance(raw_data.get('data'), dict):
-                            # 数据被包装了，解包获取真实数据
-                            actual_data = raw_data['data']
-                            logger.info(f"📦 Unwrapped packaged data: event_type={raw_data.get('event_type')}, source={raw_data.get('source')}")
-                        else:
-                            # 数据未被包装，直接使用
-                            actual_data = raw_data
-
-                        # 🔍 调试：打印解包后的数据结构
-                        data_type = actual_data.get("type", "NO_TYPE")
-                        data_keys = list(actual_data.keys())[:10]  # 前10个key
-                        logger.info(f"📥 market-stream data: type={data_type}, keys={data_keys}")
-
-                        # 1. 发送原始 trend_update 事件（使用解包后的数据）
-                        logger.info(f"📤 Broadcasting trend_update to {self.client_count} clients")
-                        self.broadcast("trend_update", actual_data, topic)
-
-                        # 2. 计算 VKS 并发送 vks_update 事件
-                        # 使用解包后的数据判断
-                        has_social_data = (
-                            actual_data.get("type") == "social_post" or
-                            actual_data.get("platform") or
-                            actual_data.get("hashtag") or
-                            actual_data.get("tag")
-                        )
-
-                        if has_social_data:
-                            vks_data = self._calculate_vks_from_market_data(actual_data)
-                            logger.info(f"📤 Broadcasting vks_update (calculated) to {self.client_count} clients: hashtag={vks_data.get('hashtag')}, score={vks_data.get('trend_score')}")
-                            self.broadcast("vks_update", vks_data, "vks-scores")
-                        else:
-                            logger.warning(f"⚠️ Skipping vks_update: no social data fields found in {data_keys}")
-                    else:
-                        value = msg.value().decode("utf-8")
-                        try:
-                            data = json.loads(value)
-                        except json.JSONDecodeError:
-                            data = {"raw": value}
-                        event_type = "message"
-                        # Broadcast to clients
-                        logger.info(f"📤 Broadcasting {event_type} to {self.client_count} clients: {data}")
-                        self.broadcast(event_type, data, topic)
+                    # 同一批里的 vks-scores 更新攒起来合并成一次广播，
+                    # 高峰期 N 条分数只做一次编码 + 每客户端一次入队
+                    # 时间戳一批算一次：同一批消息共享同一个 ISO 字符串
+                    ts = _iso_now()
+                    vks_batch = []
+                    for msg in msgs:
+                        self._handle_message(msg, vks_batch, ts)
+                    self._flush_vks_batch(vks_batch)
 
                 except asyncio.CancelledError:
                     break
                 except Exception as e:
                     logger.error(f"Error in Kafka consumer loop: {e}", exc_info=True)
                     await asyncio.sleep(1)
+                    # consume 本身失败时 pending 已是失败态，重新排一次
+                    if pending.done():
+                        pending = loop.run_in_executor(None, _consume_batch)
 
         except Exception as e:
             logger.error(f"Failed to start Kafka consumer: {e}", exc_info=True)
 
+    def _flush_vks_batch(self, vks_batch):
+        """Broadcast accumulated vks-scores updates as one event."""
+        if not vks_batch:
+            return
+        if len(vks_batch) == 1:
+            # 单条保持原事件名，前端无需改动
+            self.broadcast("vks_update", vks_batch[0], "vks-scores")
+        else:
+            logger.debug("📤 Broadcasting vks_update_batch (%d items) to %d clients",
+                         len(vks_batch), self.client_count)
+            self.broadcast("vks_update_batch", {"items": vks_batch}, "vks-scores")
+
+    def _handle_message(self, msg, vks_batch, ts: Optional[str] = None):
+        """Parse one Kafka message and broadcast the resulting SSE events.
+
+        vks-scores updates are appended to vks_batch instead of being
+        broadcast immediately; the caller flushes them once per consume
+        batch via _flush_vks_batch. ts is the ISO timestamp computed once
+        for the whole consume batch.
+        """
+        if msg.error():
+            if msg.error().code() == KafkaError._PARTITION_EOF:
+                logger.debug(f"Reached end of partition for {msg.topic()}")
+            else:
+                logger.error(f"Kafka error: {msg.error()}")
+            return
+
+        # 收到消息，打印日志（DEBUG 级别，逐条日志在高流量下本身就是开销）
+        logger.debug("📨 Received message from topic: %s, partition: %s, offset: %s",
+                     msg.topic(), msg.partition(), msg.offset())
+
+        # Parse message
+        topic = msg.topic()
+
+        # Handle vks-scores topic specially (Flink SQL outputs raw bytes)
+        if topic == "vks-scores":
+            # 纯广播载荷，不落库：没人订阅就连解析都省了
+            if not self._topic_index.get("vks-scores"):
+                return
+            data = self._parse_vks_scores_message(
+                msg, ts or _iso_now()
+            )
+            logger.debug("📥 Queued vks_update for batch broadcast: %s", data)
+            vks_batch.append(data)
+            
+        elif topic == "market-stream":
+            # market-stream has JSON format from crawler
+            # orjson 直接吃 bytes，正常路径不做 decode
+            value = msg.value()
+            try:
+                raw_data = _json_loads(value)
+            except ValueError:
+                raw_data = {"raw": value.decode("utf-8", "replace")}
+
+            # 🔧 修复：检查数据是否被 Kafka 中间件包装
+            # 如果数据被包装，keys 会是 ['event_id', 'event_type', 'data', 'source', 'ingested_at']
+            # 真正的社交数据藏在 'data' 字段里
+            if 'data' in raw_data and isinstance(raw_data.get('data'), dict):
+                # 数据被包装了，解包获取真实数据
+                actual_data = raw_data['data']
+                logger.debug("📦 Unwrapped packaged data: event_type=%s, source=%s",
+                             raw_data.get('event_type'), raw_data.get('source'))
+            else:
+                # 数据未被包装，直接使用
+                actual_data = raw_data
+
+            # 🔍 调试：打印解包后的数据结构（只在 DEBUG 时才构造 key 列表）
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("📥 market-stream data: type=%s, keys=%s",
+                             actual_data.get("type", "NO_TYPE"),
+                             list(actual_data.keys())[:10])
+
+            # 1. 发送原始 trend_update 事件（使用解包后的数据）
+            logger.debug("📤 Broadcasting trend_update to %d clients", self.client_count)
+            self.broadcast("trend_update", actual_data, topic)
+
+            # 2. 计算 VKS 并发送 vks_update 事件
+            # 使用解包后的数据判断
+            has_social_data = (
+                actual_data.get("type") == "social_post" or
+                actual_data.get("platform") or
+                actual_data.get("hashtag") or
+                actual_data.get("tag")
+            )
+
+            if has_social_data:
+                vks_data = self._calculate_vks_from_market_data(actual_data, ts)
+                logger.debug("📤 Broadcasting vks_update (calculated) to %d clients: hashtag=%s, score=%s",
+                             self.client_count, vks_data.get('hashtag'), vks_data.get('trend_score'))
+                self.broadcast("vks_update", vks_data, "vks-scores")
+            else:
+                logger.warning("⚠️ Skipping vks_update: no social data fields found in %s",
+                               list(actual_data.keys())[:10])
+        else:
+            value = msg.value()
+            try:
+                data = _json_loads(value)
+            except ValueError:
+                data = {"raw": value.decode("utf-8", "replace")}
+            event_type = "message"
+            # Broadcast to clients
+            logger.debug("📤 Broadcasting %s to %d clients: %s",
+                         event_type, self.client_count, data)
+            self.broadcast(event_type, data, topic)
+
     async def _heartbeat_loop(self):
         """Send periodic heartbeat to keep SSE connections alive."""
+        # 使用单调时钟的绝对截止时间调度，避免 sleep(interval) + 工作耗时造成的累积漂移
+        interval = 15.0  # Heartbeat every 15 seconds
+        loop = asyncio.get_event_loop()
+        next_tick = loop.time() + interval
+
         while self._running:
             try:
-                await asyncio.sleep(15)  # Heartbeat every 15 seconds
+                # 等超时或等 stop()，谁先来听谁的
+                try:
+                    await asyncio.wait_for(
+                        self._stop_event.wait(),
+                        timeout=max(0.0, next_tick - loop.time())
+                    )
+                    break  # stop_event set, shut down immediately
+                except asyncio.TimeoutError:
+                    pass
+                next_tick += interval
 
                 if self._clients:
-                    self.broadcast("heartbeat", {
-                        "type": "ping",
-                        "client_count": len(self._clients),
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
-                    logger.debug(f"Sent heartbeat to {len(self._clients)} clients")
+                    # 刚收到数据帧的客户端连接显然还活着，心跳只补给
+                    # 超过一个周期没发过任何帧的客户端
+                    mono_now = time.monotonic()
+                    stale = [
+                        (cid, entry)
+                        for cid, entry in self._clients.items()
+                        if mono_now - self._last_sent.get(cid, 0.0) >= interval
+                    ]
+                    if stale:
+                        frame = format_sse_event("heartbeat", {
+                            "type": "ping",
+                            "client_count": len(self._clients),
+                            "timestamp": _iso_now()
+                        })
+                        for cid, (buf, event) in stale:
+                            buf.append(frame)
+                            event.set()
+                            self._last_sent[cid] = mono_now
+                        logger.debug(f"Sent heartbeat to {len(stale)} idle clients")
+
+                if self._drops:
+                    for client_id, count in self._drops.items():
+                        logger.warning(
+                            f"Queue full for client {client_id}: "
+                            f"dropped {count} frames in the last {interval:.0f}s"
+                        )
+                    self._drops.clear()
 
             except asyncio.CancelledError:
                 break
@@ -657,7 +819,7 @@ stream_manager = StreamManager()
 async def sse_event_generator(
     client_id: str,
     topics: Optional[Set[str]] = None
-) -> AsyncGenerator[str, None]:
+) -> AsyncGenerator[bytes, None]:
     """
     Async generator for SSE events.
 
@@ -666,14 +828,14 @@ async def sse_event_generator(
         topics: Optional set of topics to subscribe to
 
     Yields:
-        SSE formatted event strings
+        SSE formatted event frames as bytes
     """
     # Ensure stream manager is running
     if not stream_manager.is_running:
         await stream_manager.start()
 
-    # Register client and get queue
-    queue = stream_manager.register_client(client_id, topics)
+    # Register client and get its ring buffer + wakeup event
+    buffer, event = stream_manager.register_client(client_id, topics)
 
     # Send initial connection event
     yield format_sse_event("connected", {
@@ -683,13 +845,13 @@ async def sse_event_generator(
 
     try:
         while True:
-            try:
-                # Non-blocking queue check
-                message = queue.get_nowait()
-                yield format_sse_event(message["event"], message["data"])
-            except Empty:
-                # No message available, yield nothing and wait
-                await asyncio.sleep(0.1)
+            # 有新帧就被唤醒，空闲时零轮询、零固定延迟；
+            # 帧已在 broadcast 里格式化好，这里直接透传。
+            # 先 clear 再清空缓冲，清空期间来的新帧会重新置位
+            await event.wait()
+            event.clear()
+            while buffer:
+                yield buffer.popleft()
 
     except asyncio.CancelledError:
         pass
@@ -699,9 +861,14 @@ async def sse_event_generator(
         stream_manager.unregister_client(client_id)
 
 
-def format_sse_event(event_type: str, data: dict, event_id: Optional[str] = None) -> str:
+# 事件名集合是固定的（vks_update / trend_update / heartbeat 等），
+# 按事件名缓存编码好的帧前缀
+_SSE_PREFIX_CACHE: Dict[str, bytes] = {}
+
+
+def format_sse_event(event_type: str, data: dict, event_id: Optional[str] = None) -> bytes:
     """
-    Format data as an SSE event string.
+    Format data as an SSE event frame.
 
     Args:
         event_type: Event type name
@@ -709,15 +876,16 @@ def format_sse_event(event_type: str, data: dict, event_id: Optional[str] = None
         event_id: Optional event ID for reconnection
 
     Returns:
-        SSE formatted string
+        SSE formatted bytes, ready to write to the response stream
     """
-    lines = []
-
+    # 直接产出 bytes：orjson.dumps 本来就给 bytes，出口也不必再 encode
     if event_id:
-        lines.append(f"id: {event_id}")
-
-    lines.append(f"event: {event_type}")
-    lines.append(f"data: {json.dumps(data)}")
-    lines.append("")  # Empty line to end event
-
-    return "\n".join(lines) + "\n"
+        # 罕见路径（客户端重连续传用），不值得缓存
+        return (f"id: {event_id}\nevent: {event_type}\ndata: ".encode()
+                + _json_dumps_bytes(data) + b"\n\n")
+    # 热路径：事件名只有固定几种，前缀 bytes 编码一次后复用
+    prefix = _SSE_PREFIX_CACHE.get(event_type)
+    if prefix is None:
+        prefix = _SSE_PREFIX_CACHE[event_type] = \
+            f"event: {event_type}\ndata: ".encode()
+    return prefix + _json_dumps_bytes(data) + b"\n\n"